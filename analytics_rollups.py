@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+from collections import Counter
+import mysql.connector
+from mysql.connector import Error
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Rollup tables maintained alongside the tweets table
+ROLLUP_TABLES = {
+    'rollup_job_hourly': """
+        CREATE TABLE IF NOT EXISTS rollup_job_hourly (
+            job_id INT NOT NULL,
+            hour_start DATETIME NOT NULL,
+            tweet_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, hour_start)
+        )
+    """,
+    'rollup_hashtag_daily': """
+        CREATE TABLE IF NOT EXISTS rollup_hashtag_daily (
+            job_id INT NOT NULL,
+            hashtag VARCHAR(255) NOT NULL,
+            day DATE NOT NULL,
+            tweet_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, hashtag, day),
+            INDEX idx_rollup_hashtag_day (hashtag, day)
+        )
+    """,
+    'rollup_user_daily': """
+        CREATE TABLE IF NOT EXISTS rollup_user_daily (
+            job_id INT NOT NULL,
+            user_id VARCHAR(255) NOT NULL,
+            day DATE NOT NULL,
+            user_name VARCHAR(255),
+            tweet_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, user_id, day)
+        )
+    """
+}
+
+# Rows looked up per query when reading the previous state of upserted tweets
+LOOKUP_CHUNK_SIZE = 1000
+
+def format_timestamp(value) -> str:
+    """Render a DATETIME value or string as 'YYYY-MM-DD HH:MM:SS'"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value.replace('T', ' ')[:19]
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+def add_tweet_deltas(deltas, job_id, user_id, user_name, created_at, hashtags, sign):
+    """Add one tweet's contribution to the rollup deltas"""
+    timestamp = format_timestamp(created_at)
+    # Tweets without a timestamp or job cannot be bucketed
+    if timestamp is None or job_id is None:
+        return
+
+    hour_start = timestamp[:13] + ':00:00'
+    day = timestamp[:10]
+
+    deltas['hourly'][(job_id, hour_start)] += sign
+    # Each hashtag counts once per tweet, case-insensitively
+    for hashtag in {tag.lower() for tag in hashtags}:
+        deltas['hashtag'][(job_id, hashtag, day)] += sign
+    if user_id is not None:
+        deltas['user'][(job_id, user_id, day)] += sign
+        if sign > 0:
+            deltas['user_names'][(job_id, user_id, day)] = user_name
+
+def apply_rollups(cursor, job_id: int, records):
+    """
+    Update the rollup tables for a batch of records about to be upserted.
+
+    Must run in the same transaction and before the upsert: tweets that already
+    exist are subtracted from the rollups under their previous job and values,
+    then the incoming records are added, so re-saving a tweet is counted once.
+
+    Jobs that lose tweets to this job get their updated_at bumped, since
+    cached job responses are versioned by updated_at alone.
+
+    Returns the previous engagement counts of those tweets, keyed by id, as
+    (reply_count, retweet_count, bookmark_count, last_observed_at).
+    """
+    previous = {}
+    if not records:
+        return previous
+
+    deltas = {'hourly': Counter(), 'hashtag': Counter(), 'user': Counter(), 'user_names': {}}
+
+    # A tweet repeated within the batch ends up as a single row
+    latest = {record.id: record for record in records}
+
+    ids = list(latest)
+    previous_jobs = set()
+    for start in range(0, len(ids), LOOKUP_CHUNK_SIZE):
+        chunk = ids[start:start + LOOKUP_CHUNK_SIZE]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        # Lock the previous versions so concurrent writers see a consistent state
+        cursor.execute(f"""
+            SELECT id, job_id, user_id, user_name, created_at, hashtags,
+                   reply_count, retweet_count, bookmark_count,
+                   COALESCE(metrics_checked_at, indexed_at)
+            FROM tweets
+            WHERE id IN ({placeholders})
+            FOR UPDATE
+        """, tuple(chunk))
+        for (tweet_id, old_job_id, user_id, user_name, created_at, hashtags,
+             reply_count, retweet_count, bookmark_count, observed_at) in cursor.fetchall():
+            old_hashtags = json.loads(hashtags) if isinstance(hashtags, str) else (hashtags or [])
+            add_tweet_deltas(deltas, old_job_id, user_id, user_name, created_at, old_hashtags, -1)
+            if old_job_id is not None and old_job_id != job_id:
+                previous_jobs.add(old_job_id)
+            previous[tweet_id] = (reply_count, retweet_count, bookmark_count, format_timestamp(observed_at))
+
+    for record in latest.values():
+        add_tweet_deltas(deltas, job_id, record.user_id, record.user_name,
+                         record.created_at, record.hashtags, 1)
+
+    if previous_jobs:
+        placeholders = ', '.join(['%s'] * len(previous_jobs))
+        cursor.execute(f"""
+            UPDATE scraping_jobs SET updated_at = NOW(6) WHERE job_id IN ({placeholders})
+        """, tuple(sorted(previous_jobs)))
+
+    hourly_rows = [(key[0], key[1], delta) for key, delta in deltas['hourly'].items() if delta]
+    if hourly_rows:
+        cursor.executemany("""
+            INSERT INTO rollup_job_hourly (job_id, hour_start, tweet_count)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE tweet_count = tweet_count + VALUES(tweet_count)
+        """, hourly_rows)
+
+    hashtag_rows = [(key[0], key[1], key[2], delta) for key, delta in deltas['hashtag'].items() if delta]
+    if hashtag_rows:
+        cursor.executemany("""
+            INSERT INTO rollup_hashtag_daily (job_id, hashtag, day, tweet_count)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE tweet_count = tweet_count + VALUES(tweet_count)
+        """, hashtag_rows)
+
+    user_rows = [(key[0], key[1], key[2], deltas['user_names'].get(key), delta)
+                 for key, delta in deltas['user'].items() if delta]
+    if user_rows:
+        cursor.executemany("""
+            INSERT INTO rollup_user_daily (job_id, user_id, day, user_name, tweet_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            tweet_count = tweet_count + VALUES(tweet_count),
+            user_name = COALESCE(VALUES(user_name), user_name)
+        """, user_rows)
+
+    return previous
+
+def connect_to_db():
+    """Connect to the MySQL database"""
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', ''),
+            database='xdb'
+        )
+        return connection
+    except Error as e:
+        print(json.dumps({"error": f"Error connecting to MySQL database: {str(e)}"}))
+        sys.exit(1)
+
+def rebuild_rollups(params):
+    """Recompute the rollup tables from the tweets table, for one job or all jobs"""
+    try:
+        job_id = params.get('jobId')
+
+        connection = connect_to_db()
+        cursor = connection.cursor()
+
+        job_filter = "AND t.job_id = %s" if job_id else ""
+        values = (job_id,) if job_id else ()
+
+        # Replace the rollups in one transaction so readers never see partial counts
+        connection.start_transaction()
+        for table in ROLLUP_TABLES:
+            if job_id:
+                cursor.execute(f"DELETE FROM {table} WHERE job_id = %s", values)
+            else:
+                cursor.execute(f"DELETE FROM {table}")
+
+        cursor.execute(f"""
+            INSERT INTO rollup_job_hourly (job_id, hour_start, tweet_count)
+            SELECT t.job_id, TIMESTAMP(DATE(t.created_at), MAKETIME(HOUR(t.created_at), 0, 0)), COUNT(*)
+            FROM tweets t
+            WHERE t.job_id IS NOT NULL AND t.created_at IS NOT NULL {job_filter}
+            GROUP BY t.job_id, TIMESTAMP(DATE(t.created_at), MAKETIME(HOUR(t.created_at), 0, 0))
+        """, values)
+
+        cursor.execute(f"""
+            INSERT INTO rollup_hashtag_daily (job_id, hashtag, day, tweet_count)
+            SELECT tags.job_id, tags.hashtag, tags.day, COUNT(*)
+            FROM (
+                SELECT DISTINCT t.id, t.job_id, LOWER(h.tag) AS hashtag, DATE(t.created_at) AS day
+                FROM tweets t
+                CROSS JOIN JSON_TABLE(t.hashtags, '$[*]' COLUMNS (tag VARCHAR(255) PATH '$')) h
+                WHERE t.job_id IS NOT NULL AND t.created_at IS NOT NULL {job_filter}
+            ) tags
+            GROUP BY tags.job_id, tags.hashtag, tags.day
+        """, values)
+
+        cursor.execute(f"""
+            INSERT INTO rollup_user_daily (job_id, user_id, day, user_name, tweet_count)
+            SELECT t.job_id, t.user_id, DATE(t.created_at), MAX(t.user_name), COUNT(*)
+            FROM tweets t
+            WHERE t.job_id IS NOT NULL AND t.created_at IS NOT NULL
+            AND t.user_id IS NOT NULL {job_filter}
+            GROUP BY t.job_id, t.user_id, DATE(t.created_at)
+        """, values)
+
+        # Cached analytics are versioned by scraping_jobs.updated_at
+        if job_id:
+            cursor.execute("UPDATE scraping_jobs SET updated_at = NOW(6) WHERE job_id = %s", values)
+        else:
+            cursor.execute("UPDATE scraping_jobs SET updated_at = NOW(6)")
+
+        connection.commit()
+        return {"success": True, "jobId": job_id}
+
+    except Error as e:
+        if 'connection' in locals() and connection.is_connected():
+            connection.rollback()
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def main():
+    """Main function to handle rollup maintenance"""
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Operation is required"}))
+        return
+
+    operation = sys.argv[1]
+
+    # Parse parameters if provided
+    params = {}
+    if len(sys.argv) > 2:
+        try:
+            params = json.loads(sys.argv[2])
+        except json.JSONDecodeError:
+            print(json.dumps({"error": "Invalid JSON parameters"}))
+            return
+
+    result = {"error": "Unknown operation"}
+
+    if operation == "rebuild":
+        result = rebuild_rollups(params)
+
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
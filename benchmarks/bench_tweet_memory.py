@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Compare the per-page cost of the tweet ingest path.
+
+Both modes process tweets one page at a time and release each page before
+fetching the next, as the scraper does. "legacy" runs the old save_tweets
+body: a tweet_data dict and a 19-value tuple per tweet, one execute() per
+row. "record" runs the current conversion: TweetRecord.from_tweet for the
+page, then to_row and one executemany(). Rollup and metric history work,
+which the legacy path never did, is left out so only the representation
+is compared. A stub cursor stands in for MySQL, so driver and server time
+are not included.
+
+Reported per mode: tweets/sec, the peak Python allocation while writing one
+page (tracemalloc), the process peak RSS and the RSS growth per 100k
+tweets. Each mode runs in its own subprocess so the peaks do not mix:
+
+    python benchmarks/bench_tweet_memory.py [tweet_count]
+"""
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tweet_record import TweetRecord, INSERT_TWEET_SQL
+
+PAGE_SIZE = 20
+
+# Pages measured with tracemalloc, which slows everything down
+TRACED_PAGES = 50
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+class StubCursor:
+    """Accepts statements like a MySQL cursor and keeps nothing"""
+
+    rowcount = 0
+
+    def execute(self, query, values=None):
+        self.rowcount = 1
+
+    def executemany(self, query, rows):
+        self.rowcount = len(rows)
+
+
+def fake_tweet(i):
+    """Stand-in for a twikit Tweet with a similar set of attributes"""
+    user = SimpleNamespace(id=str(1000 + i % 5000), name=f"user_{i % 5000}",
+                           screen_name=f"user_{i % 5000}", description='x' * 120)
+    text = f"Tweet number {i} about #python and #scraping with some more words to fill it out"
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return SimpleNamespace(
+        id=str(1700000000000000000 + i), text=text, full_text=text, lang='en', user=user,
+        created_at=created_at, created_at_datetime=created_at,
+        reply_count=i % 7, retweet_count=i % 11, bookmark_count=i % 3,
+        favorite_count=i % 13, view_count=str(i * 3), media=[], urls=[],
+        _data={'rest_id': str(i), 'legacy': {'full_text': text}}
+    )
+
+def save_legacy(cursor, job_id, tweets):
+    """The loop body of save_tweets before TweetRecord"""
+    tweets_saved = 0
+    for tweet in tweets:
+        hashtags = re.findall(r'#(\w+)', tweet.text)
+        tweet_data = {
+            'id': tweet.id,
+            'text': tweet.text,
+            'user_name': tweet.user.name,
+            'user_id': tweet.user.id,
+            'created_at': tweet.created_at.strftime('%Y-%m-%d %H:%M:%S') if hasattr(tweet, 'created_at') else None,
+            'reply_count': getattr(tweet, 'reply_count', 0),
+            'retweet_count': getattr(tweet, 'retweet_count', 0),
+            'bookmark_count': getattr(tweet, 'bookmark_count', 0)
+        }
+        values = (
+            tweet.id, job_id, tweet.user.name, tweet.user.id, tweet.text,
+            tweet_data['created_at'], tweet_data['reply_count'],
+            tweet_data['retweet_count'], tweet_data['bookmark_count'],
+            json.dumps(hashtags), json.dumps(tweet_data),
+            job_id, tweet.user.name, tweet.text,
+            tweet_data['reply_count'], tweet_data['retweet_count'],
+            tweet_data['bookmark_count'], json.dumps(hashtags), json.dumps(tweet_data)
+        )
+        cursor.execute("INSERT INTO tweets ...", values)
+        tweets_saved += 1
+    return tweets_saved
+
+def save_record(cursor, job_id, tweets):
+    """Convert the page once, then write it as one batch of 11-value rows"""
+    records = [TweetRecord.from_tweet(tweet) for tweet in tweets]
+    cursor.executemany(INSERT_TWEET_SQL, [record.to_row(job_id) for record in records])
+    return len(records)
+
+def ingest_page(mode, cursor, start, count):
+    page = [fake_tweet(i) for i in range(start, min(start + PAGE_SIZE, count))]
+    saved = save_legacy(cursor, 1, page) if mode == 'legacy' else save_record(cursor, 1, page)
+    # The page is released before the next one is fetched
+    del page
+    return saved
+
+def measure(mode, count):
+    cursor = StubCursor()
+    baseline = peak_rss_kb()
+
+    started = time.perf_counter()
+    saved = 0
+    for start in range(0, count, PAGE_SIZE):
+        saved += ingest_page(mode, cursor, start, count)
+    elapsed = time.perf_counter() - started
+
+    # Peak allocation while one page is written, the tweets themselves excluded
+    page_peak = 0
+    for start in range(0, TRACED_PAGES * PAGE_SIZE, PAGE_SIZE):
+        page = [fake_tweet(i) for i in range(start, start + PAGE_SIZE)]
+        tracemalloc.start()
+        save_legacy(cursor, 1, page) if mode == 'legacy' else save_record(cursor, 1, page)
+        page_peak = max(page_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    print(json.dumps({
+        'mode': mode, 'tweets': saved, 'tweets_per_sec': saved / elapsed,
+        'page_peak_bytes': page_peak, 'peak_kb': peak_rss_kb(),
+        'delta_kb_per_100k': (peak_rss_kb() - baseline) * 100000 / max(saved, 1)
+    }))
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == '--mode':
+        measure(sys.argv[2], int(sys.argv[3]))
+        return
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    results = {}
+    for mode in ('legacy', 'record'):
+        output = subprocess.run([sys.executable, __file__, '--mode', mode, str(count)],
+                                capture_output=True, text=True, check=True).stdout
+        results[mode] = json.loads(output)
+
+    print(f"{'mode':<8} {'tweets/sec':>12} {'KiB per page write':>19} {'peak RSS (MiB)':>15} "
+          f"{'RSS +KiB/100k':>14}")
+    for mode, result in results.items():
+        print(f"{mode:<8} {result['tweets_per_sec']:>12.0f} {result['page_peak_bytes'] / 1024:>19.1f} "
+              f"{result['peak_kb'] / 1024:>15.1f} {result['delta_kb_per_100k']:>14.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends from a single writer process are still safe
+    fcntl = None
+
+# Load environment variables
+load_dotenv()
+
+# A new segment file is started once the current one reaches this size
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Seconds between checks for new entries while tailing
+POLL_INTERVAL = 0.05
+
+SEGMENT_SUFFIX = '.log'
+
+# A batch whose commit marker has not shown up this long after it was
+# published is treated as rolled back (its writer crashed before committing)
+PENDING_BATCH_TIMEOUT = timedelta(minutes=10)
+
+# Attempts at appending a commit marker once the transaction has committed
+COMMIT_MARKER_ATTEMPTS = 3
+
+def get_feed_directory():
+    """Directory of the change feed, or None when publishing is disabled"""
+    return os.getenv('CHANGE_FEED_DIR') or None
+
+def list_segments(directory):
+    """Base offsets of the segment files, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(int(name[:-len(SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                  if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+
+def segment_path(directory, base_offset):
+    return os.path.join(directory, f"{base_offset:020d}{SEGMENT_SUFFIX}")
+
+class ChangeFeedWriter:
+    """
+    Append-only log of newly saved tweets, split into segment files.
+
+    An entry's offset is its byte position in the whole log: each segment is
+    named after the offset of its first byte, so any offset maps to a segment
+    and a seek position without an index.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock_path = os.path.join(directory, 'writer.lock')
+
+    def append(self, entries) -> int:
+        """Append entries as one write, returning the offset after the last one"""
+        data = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+
+        with open(self.lock_path, 'a') as lock:
+            # Serialize writers across processes on this host
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                segments = list_segments(self.directory)
+                base = segments[-1] if segments else 0
+                size = os.path.getsize(segment_path(self.directory, base)) if segments else 0
+                if size >= SEGMENT_BYTES:
+                    base, size = base + size, 0
+
+                with open(segment_path(self.directory, base), 'ab') as segment:
+                    segment.write(data)
+                    segment.flush()
+                    os.fsync(segment.fileno())
+                return base + size + len(data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+def publish_batch(job_id, records):
+    """
+    Append a batch of TweetRecords to the change feed as pending, if enabled.
+
+    Writers call this inside their transaction, just before commit, and let
+    an OSError abort the transaction. Once the commit succeeds they call
+    commit_batch with the returned batch id; readers only deliver a batch
+    after its commit marker, so a rolled back batch is never seen.
+    """
+    directory = get_feed_directory()
+    if not directory or not records:
+        return None
+
+    batch_id = uuid.uuid4().hex
+    published_at = datetime.now().isoformat()
+    entries = []
+    for record in records:
+        tweet = record.to_dict()
+        tweet['hashtags'] = list(record.hashtags)
+        entries.append({"batch": batch_id, "job_id": job_id, "published_at": published_at, "tweet": tweet})
+
+    ChangeFeedWriter(directory).append(entries)
+    return batch_id
+
+def commit_batch(batch_id):
+    """Append the commit marker of a published batch after its transaction committed"""
+    directory = get_feed_directory()
+    if not directory or batch_id is None:
+        return None
+
+    marker = {"commit": batch_id, "committed_at": datetime.now().isoformat()}
+    for attempt in range(COMMIT_MARKER_ATTEMPTS):
+        try:
+            return ChangeFeedWriter(directory).append([marker])
+        except OSError as e:
+            # The tweets are saved either way, only the feed misses the batch
+            print(f"Error appending commit marker for batch {batch_id} "
+                  f"(attempt {attempt + 1}): {e}", file=sys.stderr)
+            time.sleep(POLL_INTERVAL * 2 ** attempt)
+    return None
+
+class ChangeFeedReader:
+    """Reads entries from a byte offset onwards, following segment rollovers"""
+
+    def __init__(self, directory, offset=0):
+        self.directory = directory
+        self.offset = offset
+
+    def locate(self):
+        """Find the segment holding the current offset"""
+        segments = list_segments(self.directory)
+        candidates = [base for base in segments if base <= self.offset]
+        if not candidates:
+            # Older segments were pruned, resume from the oldest one still present
+            if segments:
+                self.offset = segments[0]
+                return segments[0]
+            return None
+        return candidates[-1]
+
+    def poll(self, max_bytes=1024 * 1024):
+        """Return (next_offset, entry) pairs available after the current offset"""
+        results = []
+        while True:
+            base = self.locate()
+            if base is None:
+                return results
+            path = segment_path(self.directory, base)
+            with open(path, 'rb') as segment:
+                segment.seek(self.offset - base)
+                data = segment.read(max_bytes)
+
+            # Only consume complete lines, a writer may be mid-append
+            end = data.rfind(b'\n')
+            if end >= 0:
+                position = self.offset
+                for line in data[:end + 1].splitlines(keepends=True):
+                    position += len(line)
+                    if line.strip():
+                        results.append((position, json.loads(line)))
+                self.offset = position
+                return results
+
+            # At the end of this segment: move on if the writer rolled over
+            if not data and self.offset - base == os.path.getsize(path) and \
+                    self.offset in list_segments(self.directory):
+                continue
+            return results
+
+def offsets_directory(directory):
+    return os.path.join(directory, 'offsets')
+
+def load_offset(directory, group):
+    """Last committed offset of a consumer group"""
+    try:
+        with open(os.path.join(offsets_directory(directory), f"{group}.json")) as offset_file:
+            return json.load(offset_file)['offset']
+    except (OSError, ValueError, KeyError):
+        return 0
+
+def commit_offset(directory, group, offset):
+    """Atomically store a consumer group's offset"""
+    os.makedirs(offsets_directory(directory), exist_ok=True)
+    path = os.path.join(offsets_directory(directory), f"{group}.json")
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as offset_file:
+        json.dump({"offset": offset, "committed_at": datetime.now().isoformat()}, offset_file)
+    os.replace(temp_path, path)
+
+class CommittedBatches:
+    """
+    Holds batch entries back until their commit marker is read.
+
+    Batches from concurrent writers interleave in the log, so each pending
+    batch remembers the offset of its first entry; the safe resume offset is
+    the oldest of those, or the read position when nothing is pending.
+    """
+
+    def __init__(self, offset):
+        self.position = offset
+        self.pending = {}
+
+    def safe_offset(self):
+        if not self.pending:
+            return self.position
+        return min(batch['start'] for batch in self.pending.values())
+
+    def expire(self, now):
+        """Drop pending batches that were published too long before now"""
+        for batch_id in [batch_id for batch_id, batch in self.pending.items()
+                         if now - batch['published_at'] > PENDING_BATCH_TIMEOUT]:
+            del self.pending[batch_id]
+
+    def add(self, next_offset, entry):
+        """Take one entry from the reader, returning a committed batch's entries or None"""
+        start, self.position = self.position, next_offset
+
+        if 'commit' in entry:
+            self.expire(datetime.fromisoformat(entry['committed_at']))
+            batch = self.pending.pop(entry['commit'], None)
+            return batch['entries'] if batch else None
+
+        if 'batch' not in entry:
+            # Entries written before commit markers were introduced
+            return [entry]
+
+        published_at = datetime.fromisoformat(entry['published_at'])
+        self.expire(published_at)
+        batch = self.pending.setdefault(entry['batch'], {
+            "start": start, "published_at": published_at, "entries": []
+        })
+        batch['entries'].append(entry)
+        return None
+
+def tail(params):
+    """
+    Print committed entries as NDJSON, committing the group's offset after each batch.
+
+    A batch is printed once its commit marker is read, and the group's offset
+    never moves past a batch still waiting for its marker. Offsets are
+    committed only after a batch is written out, so a consumer that dies
+    mid-batch sees it again (at-least-once).
+    """
+    directory = params.get('directory') or get_feed_directory()
+    group = params.get('group', 'default')
+    if not directory:
+        return {"error": "CHANGE_FEED_DIR is not configured"}
+
+    offset = params['offset'] if 'offset' in params else load_offset(directory, group)
+    reader = ChangeFeedReader(directory, offset)
+    # Resolve an offset into pruned segments before tracking batch starts
+    reader.locate()
+    batches = CommittedBatches(reader.offset)
+    try:
+        while True:
+            entries = reader.poll()
+            for next_offset, entry in entries:
+                committed = batches.add(next_offset, entry)
+                if not committed:
+                    continue
+                resume_offset = batches.safe_offset()
+                for tweet_entry in committed:
+                    tweet_entry = {key: value for key, value in tweet_entry.items() if key != 'batch'}
+                    print(json.dumps({"offset": resume_offset, **tweet_entry}), flush=True)
+                commit_offset(directory, group, resume_offset)
+            if not entries:
+                time.sleep(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        return None
+
+def prune(params):
+    """Delete segments every consumer group has fully read"""
+    directory = params.get('directory') or get_feed_directory()
+    if not directory:
+        return {"error": "CHANGE_FEED_DIR is not configured"}
+
+    groups_directory = offsets_directory(directory)
+    groups = [name[:-len('.json')] for name in os.listdir(groups_directory)
+              if name.endswith('.json')] if os.path.isdir(groups_directory) else []
+    if not groups:
+        return {"success": True, "deleted": []}
+
+    low_watermark = min(load_offset(directory, group) for group in groups)
+    segments = list_segments(directory)
+    deleted = []
+    # The newest segment is never deleted, the writer appends to it
+    for base, next_base in zip(segments, segments[1:]):
+        if next_base <= low_watermark:
+            os.remove(segment_path(directory, base))
+            deleted.append(base)
+
+    return {"success": True, "lowWatermark": low_watermark, "deleted": deleted}
+
+def main():
+    """Main function to handle change feed operations"""
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Operation is required"}))
+        return
+
+    operation = sys.argv[1]
+
+    # Parse parameters if provided
+    params = {}
+    if len(sys.argv) > 2:
+        try:
+            params = json.loads(sys.argv[2])
+        except json.JSONDecodeError:
+            print(json.dumps({"error": "Invalid JSON parameters"}))
+            return
+
+    result = {"error": "Unknown operation"}
+
+    if operation == "tail":
+        result = tail(params)
+    elif operation == "prune":
+        result = prune(params)
+
+    if result is not None:
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,46 @@
 #!/usr/bin/env python3
 import sys
 import json
+import hashlib
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector import pooling
 import os
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Connection pool used when running as a long-lived read service
+connection_pool = None
+
+# Limits concurrent requests to the pool size so borrowers never find it exhausted
+request_slots = threading.BoundedSemaphore(5)
+
+def init_connection_pool(pool_size=5):
+    """Create the connection pool shared by the read service threads"""
+    global connection_pool, request_slots
+    request_slots = threading.BoundedSemaphore(pool_size)
+    connection_pool = pooling.MySQLConnectionPool(
+        pool_name='xdb_read',
+        pool_size=pool_size,
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', ''),
+        database='xdb'
+    )
+
 def connect_to_db():
     """Connect to the MySQL database"""
+    # In service mode borrow a pooled connection; closing it returns it to the pool
+    if connection_pool is not None:
+        return connection_pool.get_connection()
+        
     try:
         # Database connection parameters
         host = os.getenv('DB_HOST', 'localhost')
@@ -29,6 +59,53 @@ def connect_to_db():
         print(json.dumps({"error": f"Error connecting to MySQL database: {str(e)}"}))
         sys.exit(1)
 
+def process_tweet(tweet):
+    """Parse JSON fields and format dates of a tweet row"""
+    # Parse JSON fields
+    if tweet['hashtags'] and isinstance(tweet['hashtags'], str):
+        try:
+            tweet['hashtags'] = json.loads(tweet['hashtags'])
+        except:
+            tweet['hashtags'] = []
+            
+    if tweet['raw_data'] and isinstance(tweet['raw_data'], str):
+        try:
+            tweet['raw_data'] = json.loads(tweet['raw_data'])
+        except:
+            tweet['raw_data'] = {}
+    
+    # Format date fields
+    if tweet['created_at']:
+        tweet['created_at'] = tweet['created_at'].isoformat()
+    if tweet['indexed_at']:
+        tweet['indexed_at'] = tweet['indexed_at'].isoformat()
+        
+    return tweet
+
+def parse_day(date_str):
+    """Parse an ISO date or datetime string into a naive UTC date"""
+    value = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+def created_at_bounds(start_date, end_date):
+    """
+    Build a created_at filter from an inclusive day range.
+    
+    Bounding created_at lets MySQL prune the monthly partitions of the tweets
+    table; on an unpartitioned table it narrows the idx_tweets_created_at scan.
+    """
+    clauses = []
+    values = []
+    if start_date:
+        clauses.append("created_at >= %s")
+        values.append(parse_day(start_date).isoformat())
+    if end_date:
+        clauses.append("created_at < %s")
+        values.append((parse_day(end_date) + timedelta(days=1)).isoformat())
+    return clauses, values
+
 def get_all_jobs():
     """Get all scraping jobs"""
     try:
@@ -53,6 +130,11 @@ def get_all_jobs():
                     job['parameters'] = json.loads(job['parameters'])
                 except:
                     job['parameters'] = {}
+            if job.get('result') and isinstance(job['result'], str):
+                try:
+                    job['result'] = json.loads(job['result'])
+                except:
+                    job['result'] = {}
             
             # Format date fields for JSON
             if job['start_time']:
@@ -61,6 +143,12 @@ def get_all_jobs():
                 job['end_time'] = job['end_time'].isoformat()
             if job['created_at']:
                 job['created_at'] = job['created_at'].isoformat()
+            if job.get('last_page_at'):
+                job['last_page_at'] = job['last_page_at'].isoformat()
+            if job.get('updated_at'):
+                job['updated_at'] = job['updated_at'].isoformat()
+            if job.get('heartbeat_at'):
+                job['heartbeat_at'] = job['heartbeat_at'].isoformat()
                 
             processed_jobs.append(job)
             
@@ -100,6 +188,11 @@ def get_job_with_tweets(params):
                 job['parameters'] = json.loads(job['parameters'])
             except:
                 job['parameters'] = {}
+        if job.get('result') and isinstance(job['result'], str):
+            try:
+                job['result'] = json.loads(job['result'])
+            except:
+                job['result'] = {}
                 
         # Format job date fields
         if job['start_time']:
@@ -108,39 +201,31 @@ def get_job_with_tweets(params):
             job['end_time'] = job['end_time'].isoformat()
         if job['created_at']:
             job['created_at'] = job['created_at'].isoformat()
+        if job.get('last_page_at'):
+            job['last_page_at'] = job['last_page_at'].isoformat()
+        if job.get('updated_at'):
+            job['updated_at'] = job['updated_at'].isoformat()
+        if job.get('heartbeat_at'):
+            job['heartbeat_at'] = job['heartbeat_at'].isoformat()
+        
+        # Restrict to the job's date range when known so only its partitions are read
+        job_parameters = job['parameters'] if isinstance(job['parameters'], dict) else {}
+        date_clauses, date_values = created_at_bounds(
+            params.get('startDate') or job_parameters.get('start_date'),
+            params.get('endDate') or job_parameters.get('end_date')
+        )
         
         # Get tweets for this job
-        tweets_query = """
+        tweets_query = f"""
             SELECT * FROM tweets
-            WHERE job_id = %s
+            WHERE {' AND '.join(['job_id = %s'] + date_clauses)}
             ORDER BY created_at DESC
         """
-        cursor.execute(tweets_query, (job_id,))
+        cursor.execute(tweets_query, (job_id, *date_values))
         tweets = cursor.fetchall()
         
         # Process tweets
-        processed_tweets = []
-        for tweet in tweets:
-            # Parse JSON fields
-            if tweet['hashtags'] and isinstance(tweet['hashtags'], str):
-                try:
-                    tweet['hashtags'] = json.loads(tweet['hashtags'])
-                except:
-                    tweet['hashtags'] = []
-                    
-            if tweet['raw_data'] and isinstance(tweet['raw_data'], str):
-                try:
-                    tweet['raw_data'] = json.loads(tweet['raw_data'])
-                except:
-                    tweet['raw_data'] = {}
-            
-            # Format date fields
-            if tweet['created_at']:
-                tweet['created_at'] = tweet['created_at'].isoformat()
-            if tweet['indexed_at']:
-                tweet['indexed_at'] = tweet['indexed_at'].isoformat()
-                
-            processed_tweets.append(tweet)
+        processed_tweets = [process_tweet(tweet) for tweet in tweets]
         
         return {
             "success": True,
@@ -148,6 +233,174 @@ def get_job_with_tweets(params):
             "tweets": processed_tweets
         }
         
+    except ValueError:
+        return {"error": "Invalid date format"}
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_tweets_by_date_range(params):
+    """Get tweets created within a date range, newest first"""
+    try:
+        start_date = params.get('startDate')
+        end_date = params.get('endDate')
+        limit = min(int(params.get('limit', 100)), 1000)
+        
+        if not start_date or not end_date:
+            return {"error": "Start date and end date are required"}
+        
+        date_clauses, date_values = created_at_bounds(start_date, end_date)
+        
+        connection = connect_to_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # The created_at bounds prune the scan to the partitions in range
+        query = f"""
+            SELECT * FROM tweets
+            WHERE {' AND '.join(date_clauses)}
+            ORDER BY created_at DESC
+            LIMIT %s
+        """
+        cursor.execute(query, (*date_values, limit))
+        tweets = [process_tweet(tweet) for tweet in cursor.fetchall()]
+        
+        return {"success": True, "tweets": tweets}
+        
+    except ValueError:
+        return {"error": "Invalid date format"}
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def fetch_analytics(cursor, job_filter, values, limit):
+    """Read tweets per hour, top hashtags and top users from the rollup tables"""
+    cursor.execute(f"""
+        SELECT hour_start, SUM(tweet_count) AS tweet_count
+        FROM rollup_job_hourly
+        WHERE {job_filter}
+        GROUP BY hour_start
+        HAVING tweet_count > 0
+        ORDER BY hour_start
+    """, values)
+    tweets_per_hour = [
+        {"hour": row['hour_start'].isoformat(), "tweet_count": int(row['tweet_count'])}
+        for row in cursor.fetchall()
+    ]
+    
+    cursor.execute(f"""
+        SELECT hashtag, SUM(tweet_count) AS tweet_count
+        FROM rollup_hashtag_daily
+        WHERE {job_filter}
+        GROUP BY hashtag
+        HAVING tweet_count > 0
+        ORDER BY tweet_count DESC
+        LIMIT %s
+    """, (*values, limit))
+    top_hashtags = [
+        {"hashtag": row['hashtag'], "tweet_count": int(row['tweet_count'])}
+        for row in cursor.fetchall()
+    ]
+    
+    cursor.execute(f"""
+        SELECT user_id, MAX(user_name) AS user_name, SUM(tweet_count) AS tweet_count
+        FROM rollup_user_daily
+        WHERE {job_filter}
+        GROUP BY user_id
+        HAVING tweet_count > 0
+        ORDER BY tweet_count DESC
+        LIMIT %s
+    """, (*values, limit))
+    top_users = [
+        {"user_id": row['user_id'], "user_name": row['user_name'], "tweet_count": int(row['tweet_count'])}
+        for row in cursor.fetchall()
+    ]
+    
+    return {
+        "tweetsPerHour": tweets_per_hour,
+        "topHashtags": top_hashtags,
+        "topUsers": top_users
+    }
+
+def get_job_analytics(params):
+    """Get aggregates for a job from the rollup tables, without scanning tweets"""
+    try:
+        job_id = params.get('jobId')
+        limit = min(int(params.get('limit', 10)), 100)
+        if not job_id:
+            return {"error": "Job ID is required"}
+        
+        connection = connect_to_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        analytics = fetch_analytics(cursor, "job_id = %s", (job_id,), limit)
+        
+        return {"success": True, "jobId": job_id, **analytics}
+        
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_query_analytics(params):
+    """Get aggregates across every job run for the same query"""
+    try:
+        query = params.get('query')
+        limit = min(int(params.get('limit', 10)), 100)
+        if not query:
+            return {"error": "Query is required"}
+        
+        connection = connect_to_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # The rollups are keyed by job, so the query is resolved to its jobs first
+        job_filter = "job_id IN (SELECT job_id FROM scraping_jobs WHERE query = %s)"
+        analytics = fetch_analytics(cursor, job_filter, (query,), limit)
+        
+        return {"success": True, "query": query, **analytics}
+        
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_conversation(params):
+    """Get an expanded conversation, root first, from any tweet in it"""
+    try:
+        tweet_id = params.get('tweetId')
+        if not tweet_id:
+            return {"error": "Tweet ID is required"}
+        
+        connection = connect_to_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # Resolve the conversation root from the relation's primary key
+        cursor.execute("SELECT root_id FROM tweet_relations WHERE child_id = %s", (tweet_id,))
+        relation = cursor.fetchone()
+        if not relation:
+            return {"error": "Conversation not found"}
+        
+        # The whole tree comes back from idx_relations_root joined on the tweets key
+        cursor.execute("""
+            SELECT r.parent_id, r.depth, t.*
+            FROM tweet_relations r
+            JOIN tweets t ON t.id = r.child_id
+            WHERE r.root_id = %s
+            ORDER BY r.depth, t.created_at
+        """, (relation['root_id'],))
+        tweets = [process_tweet(tweet) for tweet in cursor.fetchall()]
+        
+        return {"success": True, "rootId": relation['root_id'], "tweets": tweets}
+        
     except Error as e:
         return {"error": f"Database error: {str(e)}"}
     finally:
@@ -155,6 +408,222 @@ def get_job_with_tweets(params):
             cursor.close()
             connection.close()
 
+def get_job_progress(params):
+    """Get the progress fields of queued and running jobs and any explicitly requested jobs"""
+    try:
+        job_ids = [int(job_id) for job_id in params.get('jobIds', [])]
+            
+        connection = connect_to_db()
+        cursor = connection.cursor(dictionary=True)
+        
+        # Only the small progress columns are read so this stays cheap to poll
+        query = """
+            SELECT job_id, status, tweet_count, last_page_at, end_time
+            FROM scraping_jobs
+            WHERE status IN ('PENDING', 'RUNNING')
+        """
+        if job_ids:
+            placeholders = ', '.join(['%s'] * len(job_ids))
+            query += f" OR job_id IN ({placeholders})"
+        
+        cursor.execute(query, tuple(job_ids))
+        jobs = cursor.fetchall()
+        
+        for job in jobs:
+            if job['last_page_at']:
+                job['last_page_at'] = job['last_page_at'].isoformat()
+            if job['end_time']:
+                job['end_time'] = job['end_time'].isoformat()
+        
+        return {"success": True, "jobs": jobs}
+        
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_jobs_version():
+    """Get a cheap fingerprint of the jobs table that changes whenever any job does"""
+    try:
+        connection = connect_to_db()
+        cursor = connection.cursor()
+        
+        # updated_at is bumped on every status change and every saved page
+        cursor.execute("SELECT COUNT(*), MAX(updated_at) FROM scraping_jobs")
+        job_count, last_update = cursor.fetchone()
+        
+        return f"{job_count}:{last_update.isoformat() if last_update else ''}"
+        
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_job_version(job_id):
+    """Get a fingerprint of a single job and the tweets attached to it"""
+    try:
+        connection = connect_to_db()
+        cursor = connection.cursor()
+        
+        # A primary key lookup: every writer that changes a job's tweets, including
+        # tweets moving to another job, metric refreshes and retention, bumps updated_at
+        cursor.execute("SELECT updated_at FROM scraping_jobs WHERE job_id = %s", (job_id,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        last_update = row[0]
+        return last_update.isoformat() if last_update else ''
+        
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+class ResponseCache:
+    """Thread-safe LRU cache of serialized responses keyed by request and ETag"""
+    
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key, etag):
+        """Return the cached body if it was stored under the same ETag"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != etag:
+                # The underlying rows changed, drop the stale response
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, etag, body):
+        """Store a response body, evicting the least recently used entry"""
+        with self.lock:
+            self.entries[key] = (etag, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+def make_etag(key, version):
+    """Build a quoted ETag from a cache key and a data version"""
+    digest = hashlib.sha1(f"{key}|{version}".encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+response_cache = ResponseCache()
+
+class ReadServiceHandler(BaseHTTPRequestHandler):
+    """HTTP handler exposing the read operations with conditional GET support"""
+    
+    def do_GET(self):
+        with request_slots:
+            self.handle_get()
+    
+    def handle_get(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        
+        try:
+            if parts == ['health']:
+                self.send_json(200, {"success": True})
+            elif parts == ['jobs']:
+                self.send_cached('jobs', get_jobs_version(), get_all_jobs)
+            elif parts == ['jobs', 'progress']:
+                # Progress is polled by the SSE stream and changes constantly, never cache it
+                job_ids = [job_id for value in query.get('jobIds', []) for job_id in value.split(',') if job_id]
+                self.send_json(200, get_job_progress({"jobIds": job_ids}))
+            elif parts == ['tweets']:
+                params = {key: values[0] for key, values in query.items()}
+                self.send_json(200, get_tweets_by_date_range(params))
+            elif len(parts) == 2 and parts[0] == 'conversations':
+                self.send_json(200, get_conversation({"tweetId": parts[1]}))
+            elif parts == ['analytics']:
+                params = {key: values[0] for key, values in query.items()}
+                self.send_cached(f"analytics?{url.query}", get_jobs_version(), lambda: get_query_analytics(params))
+            elif len(parts) == 3 and parts[0] == 'jobs' and parts[1].isdigit() and parts[2] == 'analytics':
+                job_id = int(parts[1])
+                # Rollup writes and rebuilds bump updated_at, so revalidating
+                # reads one jobs row whatever the tweet volume
+                version = get_job_version(job_id)
+                if version is None:
+                    self.send_json(404, {"error": "Job not found"})
+                    return
+                self.send_cached(f"jobs/{job_id}/analytics", version, lambda: get_job_analytics({"jobId": job_id}))
+            elif len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+                job_id = int(parts[1])
+                version = get_job_version(job_id)
+                if version is None:
+                    self.send_json(404, {"error": "Job not found"})
+                    return
+                self.send_cached(f"jobs/{job_id}", version, lambda: get_job_with_tweets({"jobId": job_id}))
+            else:
+                self.send_json(404, {"error": "Unknown operation"})
+        except Error as e:
+            self.send_json(500, {"error": f"Database error: {str(e)}"})
+    
+    def send_cached(self, key, version, load):
+        """Answer from the cache or If-None-Match when the data version is unchanged"""
+        etag = make_etag(key, version)
+        
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        
+        body = response_cache.get(key, etag)
+        if body is None:
+            result = load()
+            body = json.dumps(result).encode('utf-8')
+            # Errors are not cached so a retry hits the database again
+            if "error" in result:
+                self.send_body(500, body)
+                return
+            response_cache.put(key, etag, body)
+        
+        self.send_body(200, body, etag)
+    
+    def send_json(self, status, result):
+        self.send_body(status, json.dumps(result).encode('utf-8'))
+    
+    def send_body(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        # Keep stdout quiet, log requests to stderr only
+        sys.stderr.write("%s - %s\n" % (self.address_string(), format % args))
+
+def serve(params):
+    """Run the read operations as a persistent HTTP service"""
+    host = params.get('host', os.getenv('DB_SERVICE_HOST', '127.0.0.1'))
+    port = int(params.get('port', os.getenv('DB_SERVICE_PORT', 8765)))
+    pool_size = int(params.get('poolSize', os.getenv('DB_POOL_SIZE', 5)))
+    
+    init_connection_pool(pool_size)
+    server = ThreadingHTTPServer((host, port), ReadServiceHandler)
+    print(f"DB read service listening on http://{host}:{port}", file=sys.stderr)
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
 def main():
     """Main function to handle database operations"""
     if len(sys.argv) < 2:
@@ -172,6 +641,11 @@ def main():
             print(json.dumps({"error": "Invalid JSON parameters"}))
             return
     
+    # Run as a long-lived service instead of answering a single operation
+    if operation == "serve":
+        serve(params)
+        return
+    
     # Execute the requested operation
     result = {"error": "Unknown operation"}
     
@@ -179,6 +653,16 @@ def main():
         result = get_all_jobs()
     elif operation == "get_job_with_tweets":
         result = get_job_with_tweets(params)
+    elif operation == "get_job_progress":
+        result = get_job_progress(params)
+    elif operation == "get_tweets_by_date_range":
+        result = get_tweets_by_date_range(params)
+    elif operation == "get_job_analytics":
+        result = get_job_analytics(params)
+    elif operation == "get_query_analytics":
+        result = get_query_analytics(params)
+    elif operation == "get_conversation":
+        result = get_conversation(params)
     
     # Print the result as JSON to be captured by the Node.js process
     print(json.dumps(result))
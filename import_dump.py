@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import gzip
+import time
+import tempfile
+from datetime import datetime
+import mysql.connector
+from mysql.connector import Error
+from dotenv import load_dotenv
+from tweet_record import (TweetRecord, insert_tweet_records, format_created_at,
+                          TWEET_COLUMNS, TWEET_UPSERT_CLAUSE)
+from analytics_rollups import apply_rollups
+from metrics_history import record_metric_changes
+from change_feed import publish_batch, commit_batch
+
+# Load environment variables
+load_dotenv()
+
+# Records loaded per transaction; memory use is bounded by one chunk
+DEFAULT_CHUNK_SIZE = 5000
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5
+
+def connect_to_db(allow_local_infile=False):
+    """Connect to the MySQL database"""
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', ''),
+            database='xdb',
+            allow_local_infile=allow_local_infile
+        )
+        return connection
+    except Error as e:
+        print(json.dumps({"error": f"Error connecting to MySQL database: {str(e)}"}))
+        sys.exit(1)
+
+def open_dump(path):
+    """Open a plain or gzip-compressed NDJSON dump for streaming"""
+    # Invalid bytes become U+FFFD instead of aborting a multi-GB import
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace')
+    return open(path, 'r', encoding='utf-8', errors='replace')
+
+def map_record(item) -> TweetRecord:
+    """
+    Map one dump entry to a TweetRecord, or None if it is not a usable tweet.
+
+    Understands our own raw_data and archive rows, Twitter API v1.1 tweets and
+    Twitter API v2 tweets (optionally wrapped in {"data": ...}).
+    """
+    if not isinstance(item, dict):
+        return None
+    if isinstance(item.get('data'), dict):
+        item = item['data']
+
+    tweet_id = item.get('id_str') or item.get('id')
+    text = item.get('full_text') or item.get('text')
+    created_at = item.get('created_at')
+    if not tweet_id or text is None or not created_at:
+        return None
+
+    user = item.get('user') if isinstance(item.get('user'), dict) else {}
+    metrics = item.get('public_metrics') if isinstance(item.get('public_metrics'), dict) else item
+
+    return TweetRecord(
+        id=str(tweet_id),
+        user_name=item.get('user_name') or user.get('name') or user.get('screen_name'),
+        user_id=str(item.get('user_id') or user.get('id_str') or user.get('id') or item.get('author_id') or '') or None,
+        text=text,
+        created_at=format_created_at(created_at),
+        reply_count=metrics.get('reply_count') or 0,
+        retweet_count=metrics.get('retweet_count') or 0,
+        bookmark_count=metrics.get('bookmark_count') or 0
+    )
+
+def read_records(path, stats):
+    """Stream TweetRecords from a dump, counting lines that cannot be used"""
+    with open_dump(path) as dump:
+        for line in dump:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = map_record(json.loads(line))
+            except (ValueError, TypeError):
+                record = None
+            if record is None:
+                stats['skipped'] += 1
+                continue
+            yield record
+
+def escape_infile_value(value) -> str:
+    """Escape a value for LOAD DATA's default tab-separated format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+# Per-connection staging table for LOAD DATA; seq keeps the file order so the
+# last copy of a tweet repeated within a chunk wins, as in the INSERT path
+STAGING_TABLE_SQL = """
+    CREATE TEMPORARY TABLE IF NOT EXISTS tweets_import_staging (
+        seq INT AUTO_INCREMENT PRIMARY KEY,
+        id VARCHAR(255) NOT NULL,
+        job_id INT,
+        user_name VARCHAR(255),
+        user_id VARCHAR(255),
+        text TEXT,
+        created_at DATETIME,
+        reply_count INT,
+        retweet_count INT,
+        bookmark_count INT,
+        hashtags JSON,
+        raw_data JSON
+    )
+"""
+
+def load_chunk_infile(cursor, job_id, records):
+    """
+    Load one chunk through a temporary file and LOAD DATA LOCAL INFILE.
+
+    Rows are loaded into a staging table and upserted from there with the
+    same update clause as the INSERT path, so existing tweets keep their
+    indexed_at instead of being deleted and re-inserted.
+    """
+    previous = apply_rollups(cursor, job_id, records)
+    record_metric_changes(cursor, previous, records)
+
+    # Temporary tables can be created and emptied without an implicit commit
+    cursor.execute(STAGING_TABLE_SQL)
+    cursor.execute("DELETE FROM tweets_import_staging")
+
+    handle, path = tempfile.mkstemp(suffix='.tsv')
+    try:
+        with os.fdopen(handle, 'w', encoding='utf-8') as infile:
+            for record in records:
+                infile.write('\t'.join(escape_infile_value(value) for value in record.to_row(job_id)) + '\n')
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}'
+            INTO TABLE tweets_import_staging
+            CHARACTER SET utf8mb4
+            ({TWEET_COLUMNS})
+        """)
+    finally:
+        os.remove(path)
+
+    cursor.execute(f"""
+        INSERT INTO tweets ({TWEET_COLUMNS})
+        SELECT {TWEET_COLUMNS} FROM tweets_import_staging ORDER BY seq
+        {TWEET_UPSERT_CLAUSE}
+    """)
+    return len(records)
+
+def create_import_job(cursor, path, params):
+    """Create the synthetic job that imported tweets are attached to"""
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("""
+        INSERT INTO scraping_jobs
+        (job_type, query, parameters, start_time, status)
+        VALUES (%s, %s, %s, %s, %s)
+    """, ('IMPORT_DUMP', os.path.basename(path)[:255], json.dumps(params), current_time, 'RUNNING'))
+    return cursor.lastrowid
+
+def finish_import_job(cursor, job_id, status, tweet_count, result):
+    """Mark the import job finished with its result"""
+    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    cursor.execute("""
+        UPDATE scraping_jobs
+        SET status = %s, end_time = %s, tweet_count = %s, result = %s
+        WHERE job_id = %s
+    """, (status, current_time, tweet_count, json.dumps(result), job_id))
+
+def import_dump(params):
+    """Stream an NDJSON dump into the tweets table under a synthetic import job"""
+    path = params.get('path')
+    method = params.get('method', 'batch')
+    chunk_size = int(params.get('chunkSize', DEFAULT_CHUNK_SIZE))
+
+    if not path or not os.path.exists(path):
+        return {"error": f"Dump file not found: {path}"}
+    if method not in ('batch', 'load_data'):
+        return {"error": "Method must be 'batch' or 'load_data'"}
+
+    try:
+        connection = connect_to_db(allow_local_infile=(method == 'load_data'))
+        cursor = connection.cursor()
+
+        job_id = create_import_job(cursor, path, {"path": path, "method": method, "chunk_size": chunk_size})
+        connection.commit()
+        print(json.dumps({"success": True, "jobId": job_id, "status": "RUNNING"}), flush=True)
+
+        stats = {"rows": 0, "skipped": 0}
+        started = time.monotonic()
+        last_report = started
+        chunk = []
+
+        def write_chunk():
+            # Each chunk is its own transaction: tweets, rollups and job progress together
+            if method == 'load_data':
+                stats['rows'] += load_chunk_infile(cursor, job_id, chunk)
+            else:
+                stats['rows'] += insert_tweet_records(cursor, job_id, chunk)
+            cursor.execute("""
+                UPDATE scraping_jobs SET tweet_count = %s, last_page_at = %s WHERE job_id = %s
+            """, (stats['rows'], datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job_id))
+            batch_id = publish_batch(job_id, chunk)
+            connection.commit()
+            commit_batch(batch_id)
+            chunk.clear()
+
+        try:
+            for record in read_records(path, stats):
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    write_chunk()
+                    now = time.monotonic()
+                    if now - last_report >= PROGRESS_INTERVAL:
+                        last_report = now
+                        print(f"Imported {stats['rows']} rows "
+                              f"({stats['rows'] / (now - started):.0f} rows/sec)", file=sys.stderr)
+            if chunk:
+                write_chunk()
+        except Exception as e:
+            # Any failure closes the job, otherwise it would stay RUNNING forever
+            connection.rollback()
+            result = {"error": str(e), "rows": stats['rows'], "skipped": stats['skipped']}
+            finish_import_job(cursor, job_id, 'FAILED', stats['rows'], result)
+            connection.commit()
+            return {"jobId": job_id, **result}
+
+        elapsed = time.monotonic() - started
+        result = {
+            "rows": stats['rows'],
+            "skipped": stats['skipped'],
+            "seconds": round(elapsed, 2),
+            "rowsPerSec": round(stats['rows'] / elapsed) if elapsed else stats['rows'],
+            "method": method
+        }
+        finish_import_job(cursor, job_id, 'COMPLETED', stats['rows'], result)
+        connection.commit()
+
+        return {"success": True, "jobId": job_id, **result}
+
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def main():
+    """Main function to handle import requests"""
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Operation is required"}))
+        return
+
+    operation = sys.argv[1]
+
+    # Parse parameters if provided
+    params = {}
+    if len(sys.argv) > 2:
+        try:
+            params = json.loads(sys.argv[2])
+        except json.JSONDecodeError:
+            print(json.dumps({"error": "Invalid JSON parameters"}))
+            return
+
+    result = {"error": "Unknown operation"}
+
+    if operation == "import":
+        result = import_dump(params)
+
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
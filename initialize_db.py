@@ -2,10 +2,23 @@ import mysql.connector
 from mysql.connector import Error
 import os
 from dotenv import load_dotenv
+from partition_manager import monthly_partition_clause
+from analytics_rollups import ROLLUP_TABLES
+from metrics_history import METRICS_HISTORY_TABLE
 
 # Load environment variables from .env file
 load_dotenv()
 
+def add_column_if_missing(cursor, table, column, definition):
+    """Add a column to an existing table if it is not already present"""
+    cursor.execute("""
+        SELECT COUNT(1) ColumnIsThere FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE table_schema=DATABASE() AND table_name=%s AND column_name=%s
+    """, (table, column))
+    if not cursor.fetchone()[0]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"Added column '{column}' to table '{table}'")
+
 def create_database():
     """Create the database and required tables"""
     
@@ -14,6 +27,9 @@ def create_database():
     user = os.getenv('DB_USER', 'root')
     password = os.getenv('DB_PASSWORD', '')
     
+    # Optional monthly RANGE partitioning of the tweets table on created_at
+    partitioned = os.getenv('TWEETS_PARTITIONING', '').lower() == 'monthly'
+    
     try:
         # Connect to MySQL server
         connection = mysql.connector.connect(
@@ -43,30 +59,103 @@ def create_database():
                     end_time DATETIME,
                     status VARCHAR(20) NOT NULL,
                     tweet_count INT DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    last_page_at DATETIME,
+                    result JSON,
+                    worker_id VARCHAR(255),
+                    heartbeat_at DATETIME,
+                    attempts INT NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
                 )
             """)
             print("Table 'scraping_jobs' created or already exists")
             
+            # Bring tables created by older versions up to date
+            add_column_if_missing(cursor, 'scraping_jobs', 'last_page_at', 'DATETIME')
+            add_column_if_missing(cursor, 'scraping_jobs', 'result', 'JSON')
+            add_column_if_missing(cursor, 'scraping_jobs', 'updated_at',
+                                  'TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)')
+            add_column_if_missing(cursor, 'scraping_jobs', 'worker_id', 'VARCHAR(255)')
+            add_column_if_missing(cursor, 'scraping_jobs', 'heartbeat_at', 'DATETIME')
+            add_column_if_missing(cursor, 'scraping_jobs', 'attempts', 'INT NOT NULL DEFAULT 0')
+            
             # Create tweets table
+            if partitioned:
+                # Partitioned tables need the partition column in every unique key
+                # and do not support foreign keys
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS tweets (
+                        id VARCHAR(255) NOT NULL,
+                        job_id INT,
+                        user_name VARCHAR(255),
+                        user_id VARCHAR(255),
+                        text TEXT,
+                        created_at DATETIME NOT NULL,
+                        reply_count INT DEFAULT 0,
+                        retweet_count INT DEFAULT 0,
+                        bookmark_count INT DEFAULT 0,
+                        hashtags JSON,
+                        raw_data JSON,
+                        indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        metrics_checked_at DATETIME,
+                        PRIMARY KEY (id, created_at)
+                    )
+                    {monthly_partition_clause()}
+                """)
+            else:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS tweets (
+                        id VARCHAR(255) PRIMARY KEY,
+                        job_id INT,
+                        user_name VARCHAR(255),
+                        user_id VARCHAR(255),
+                        text TEXT,
+                        created_at DATETIME,
+                        reply_count INT DEFAULT 0,
+                        retweet_count INT DEFAULT 0,
+                        bookmark_count INT DEFAULT 0,
+                        hashtags JSON,
+                        raw_data JSON,
+                        indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        metrics_checked_at DATETIME,
+                        FOREIGN KEY (job_id) REFERENCES scraping_jobs(job_id)
+                    )
+                """)
+            print("Table 'tweets' created or already exists")
+            add_column_if_missing(cursor, 'tweets', 'metrics_checked_at', 'DATETIME')
+            
+            if partitioned:
+                cursor.execute("""
+                    SELECT COUNT(1) FROM INFORMATION_SCHEMA.PARTITIONS
+                    WHERE table_schema=DATABASE() AND table_name='tweets'
+                    AND partition_name IS NOT NULL
+                """)
+                if not cursor.fetchone()[0]:
+                    print("Warning: existing 'tweets' table is not partitioned; "
+                          "migrate it manually before enabling retention")
+            
+            # Create reply relations table, one row per tweet in an expanded conversation
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS tweets (
-                    id VARCHAR(255) PRIMARY KEY,
+                CREATE TABLE IF NOT EXISTS tweet_relations (
+                    child_id VARCHAR(255) PRIMARY KEY,
+                    parent_id VARCHAR(255),
+                    root_id VARCHAR(255) NOT NULL,
+                    depth INT NOT NULL,
                     job_id INT,
-                    user_name VARCHAR(255),
-                    user_id VARCHAR(255),
-                    text TEXT,
-                    created_at DATETIME,
-                    reply_count INT DEFAULT 0,
-                    retweet_count INT DEFAULT 0,
-                    bookmark_count INT DEFAULT 0,
-                    hashtags JSON,
-                    raw_data JSON,
-                    indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (job_id) REFERENCES scraping_jobs(job_id)
+                    INDEX idx_relations_root (root_id, depth),
+                    INDEX idx_relations_parent (parent_id)
                 )
             """)
-            print("Table 'tweets' created or already exists")
+            print("Table 'tweet_relations' created or already exists")
+            
+            # Create engagement metrics history table
+            cursor.execute(METRICS_HISTORY_TABLE)
+            print("Table 'tweet_metrics_history' created or already exists")
+            
+            # Create analytics rollup tables
+            for table, ddl in ROLLUP_TABLES.items():
+                cursor.execute(ddl)
+                print(f"Table '{table}' created or already exists")
             
             # Create index for faster lookups
             try:
@@ -90,6 +179,47 @@ def create_database():
                     cursor.execute("DROP INDEX idx_tweets_created_at ON tweets")
                     
                 cursor.execute("CREATE INDEX idx_tweets_created_at ON tweets(created_at)")
+                
+                cursor.execute("""
+                    SELECT COUNT(1) IndexIsThere FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE table_schema=DATABASE() AND table_name='scraping_jobs' 
+                    AND index_name='idx_jobs_status'
+                """)
+                if cursor.fetchone()[0]:
+                    cursor.execute("DROP INDEX idx_jobs_status ON scraping_jobs")
+                    
+                cursor.execute("CREATE INDEX idx_jobs_status ON scraping_jobs(status)")
+                
+                # Lets the reaper find stale RUNNING jobs without scanning the table
+                cursor.execute("""
+                    SELECT COUNT(1) IndexIsThere FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE table_schema=DATABASE() AND table_name='scraping_jobs' 
+                    AND index_name='idx_jobs_heartbeat'
+                """)
+                if cursor.fetchone()[0]:
+                    cursor.execute("DROP INDEX idx_jobs_heartbeat ON scraping_jobs")
+                    
+                cursor.execute("CREATE INDEX idx_jobs_heartbeat ON scraping_jobs(status, heartbeat_at)")
+                
+                cursor.execute("""
+                    SELECT COUNT(1) IndexIsThere FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE table_schema=DATABASE() AND table_name='scraping_jobs' 
+                    AND index_name='idx_jobs_updated_at'
+                """)
+                if cursor.fetchone()[0]:
+                    cursor.execute("DROP INDEX idx_jobs_updated_at ON scraping_jobs")
+                    
+                cursor.execute("CREATE INDEX idx_jobs_updated_at ON scraping_jobs(updated_at)")
+                
+                cursor.execute("""
+                    SELECT COUNT(1) IndexIsThere FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE table_schema=DATABASE() AND table_name='scraping_jobs' 
+                    AND index_name='idx_jobs_query'
+                """)
+                if cursor.fetchone()[0]:
+                    cursor.execute("DROP INDEX idx_jobs_query ON scraping_jobs")
+                    
+                cursor.execute("CREATE INDEX idx_jobs_query ON scraping_jobs(query)")
                 print("Indexes created successfully")
             except Error as e:
                 print(f"Warning when creating indexes: {e}")
@@ -0,0 +1,57 @@
+# Append-only engagement observations, one row per tweet whose counts changed
+METRICS_HISTORY_TABLE = """
+    CREATE TABLE IF NOT EXISTS tweet_metrics_history (
+        history_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        tweet_id VARCHAR(255) NOT NULL,
+        observed_at DATETIME NOT NULL,
+        reply_count INT NOT NULL,
+        retweet_count INT NOT NULL,
+        bookmark_count INT NOT NULL,
+        INDEX idx_metrics_history_tweet (tweet_id, observed_at)
+    )
+"""
+
+def record_metrics(record) -> tuple:
+    """Engagement counts of a TweetRecord, in history column order"""
+    return (record.reply_count or 0, record.retweet_count or 0, record.bookmark_count or 0)
+
+def record_metric_changes(cursor, previous, records) -> int:
+    """
+    Append history rows for records whose engagement counts changed.
+
+    previous maps tweet ids to (reply_count, retweet_count, bookmark_count,
+    last_observed_at) as stored before this write. The first time a tweet
+    changes, its stored counts are written too, so the history starts from
+    the original observation rather than from the first change. New
+    observations are stamped with the database clock, like the
+    metrics_checked_at they are compared against.
+    """
+    # A tweet repeated within the batch ends up as a single row
+    latest = {record.id: record for record in records}
+    changed = [record for tweet_id, record in latest.items()
+               if tweet_id in previous and tuple(previous[tweet_id][:3]) != record_metrics(record)]
+    if not changed:
+        return 0
+
+    placeholders = ', '.join(['%s'] * len(changed))
+    cursor.execute(f"""
+        SELECT DISTINCT tweet_id FROM tweet_metrics_history
+        WHERE tweet_id IN ({placeholders})
+    """, tuple(record.id for record in changed))
+    has_history = {row[0] for row in cursor.fetchall()}
+
+    rows = []
+    for record in changed:
+        if record.id not in has_history:
+            reply_count, retweet_count, bookmark_count, last_observed_at = previous[record.id]
+            rows.append((record.id, last_observed_at,
+                         reply_count or 0, retweet_count or 0, bookmark_count or 0))
+        rows.append((record.id, None, *record_metrics(record)))
+
+    # A NULL observed_at stands for this write, stamped with NOW()
+    cursor.executemany("""
+        INSERT INTO tweet_metrics_history
+        (tweet_id, observed_at, reply_count, retweet_count, bookmark_count)
+        VALUES (%s, COALESCE(%s, NOW()), %s, %s, %s)
+    """, rows)
+    return len(changed)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import gzip
+from datetime import date, datetime
+from decimal import Decimal
+import mysql.connector
+from mysql.connector import Error
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Partition that catches rows beyond the last monthly boundary
+MAXVALUE_PARTITION = 'pmax'
+
+def month_start(value: date, offset: int = 0) -> date:
+    """First day of the month `offset` months away from `value`"""
+    month_index = value.year * 12 + (value.month - 1) + offset
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    """Name of the partition holding the given month, e.g. p202401"""
+    return f"p{month.year:04d}{month.month:02d}"
+
+def partition_definition(month: date) -> str:
+    """DDL for the partition holding the given month"""
+    upper_bound = month_start(month, 1).isoformat()
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{upper_bound}')"
+
+def monthly_partition_clause(months_back: int = 12, months_ahead: int = 3) -> str:
+    """PARTITION BY clause for a new tweets table, one partition per month"""
+    current = month_start(date.today())
+    partitions = [partition_definition(month_start(current, offset))
+                  for offset in range(-months_back, months_ahead + 1)]
+    partitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return "PARTITION BY RANGE COLUMNS(created_at) (\n    " + ",\n    ".join(partitions) + "\n)"
+
+def connect_to_db():
+    """Connect to the MySQL database"""
+    try:
+        connection = mysql.connector.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', 'root'),
+            password=os.getenv('DB_PASSWORD', ''),
+            database='xdb'
+        )
+        return connection
+    except Error as e:
+        print(json.dumps({"error": f"Error connecting to MySQL database: {str(e)}"}))
+        sys.exit(1)
+
+def get_monthly_partitions(cursor) -> list:
+    """List the monthly partitions of the tweets table, oldest first"""
+    cursor.execute("""
+        SELECT PARTITION_NAME, TABLE_ROWS FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'tweets'
+        AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    partitions = []
+    for name, rows in cursor.fetchall():
+        if name == MAXVALUE_PARTITION:
+            continue
+        partitions.append({
+            "name": name,
+            "month": date(int(name[1:5]), int(name[5:7]), 1),
+            "rows": rows
+        })
+    return partitions
+
+def add_partitions(params):
+    """Split upcoming months out of the MAXVALUE partition before data arrives"""
+    try:
+        months_ahead = int(params.get('monthsAhead', 3))
+
+        connection = connect_to_db()
+        cursor = connection.cursor()
+
+        partitions = get_monthly_partitions(cursor)
+        if not partitions:
+            return {"error": "Table 'tweets' is not partitioned"}
+
+        last_month = partitions[-1]["month"]
+        target_month = month_start(date.today(), months_ahead)
+        new_months = []
+        month = month_start(last_month, 1)
+        while month <= target_month:
+            new_months.append(month)
+            month = month_start(month, 1)
+
+        if new_months:
+            # pmax is empty as long as partitions are added ahead of time, so this is cheap
+            definitions = [partition_definition(month) for month in new_months]
+            definitions.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+            cursor.execute(f"""
+                ALTER TABLE tweets REORGANIZE PARTITION {MAXVALUE_PARTITION} INTO (
+                    {', '.join(definitions)}
+                )
+            """)
+
+        return {"success": True, "added": [partition_name(month) for month in new_months]}
+
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def json_default(value):
+    """Serialize database values that json does not handle natively"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    raise TypeError(f"Cannot serialize {type(value)}")
+
+def archive_table(connection, table: str, name: str, archive_dir: str) -> int:
+    """Stream a table holding one retired partition to a gzip-compressed NDJSON file"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"tweets_{name}.ndjson.gz")
+    # Rows that reached the month after an earlier run go to a numbered file
+    # next to its archive instead of replacing it
+    sequence = 0
+    while os.path.exists(path):
+        sequence += 1
+        path = os.path.join(archive_dir, f"tweets_{name}.{sequence}.ndjson.gz")
+    temp_path = path + '.tmp'
+
+    # An unbuffered cursor streams rows instead of loading the whole partition
+    cursor = connection.cursor(dictionary=True, buffered=False)
+    archived = 0
+    try:
+        cursor.execute(f"SELECT * FROM {table}")
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as archive:
+            for row in cursor:
+                for field in ('hashtags', 'raw_data'):
+                    if row.get(field) and isinstance(row[field], str):
+                        row[field] = json.loads(row[field])
+                archive.write(json.dumps(row, default=json_default) + '\n')
+                archived += 1
+    finally:
+        cursor.close()
+
+    # Only publish the archive once it is complete
+    os.replace(temp_path, path)
+    print(f"Archived {archived} tweets from partition {name} to {path}", file=sys.stderr)
+    return archived
+
+def table_exists(cursor, table: str) -> bool:
+    cursor.execute("""
+        SELECT COUNT(1) FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    return cursor.fetchone()[0] > 0
+
+def owning_jobs(cursor, source: str) -> list:
+    """Ids of the jobs owning the tweets in a table or partition"""
+    cursor.execute(f"SELECT DISTINCT job_id FROM {source} WHERE job_id IS NOT NULL")
+    return [row[0] for row in cursor.fetchall()]
+
+def bump_job_versions(connection, cursor, job_ids: list):
+    """Bump updated_at of jobs that lost tweets, their cached responses are versioned by it"""
+    if job_ids:
+        placeholders = ', '.join(['%s'] * len(job_ids))
+        cursor.execute(f"""
+            UPDATE scraping_jobs SET updated_at = NOW(6) WHERE job_id IN ({placeholders})
+        """, tuple(job_ids))
+        connection.commit()
+
+def retire_partition(connection, cursor, name: str, archive_dir: str) -> int:
+    """
+    Swap a partition out into a standalone table, archive it and drop it.
+
+    EXCHANGE PARTITION moves the rows out in one metadata operation, so
+    nothing written to the month while the archive runs can be lost: such
+    rows stay in the emptied partition, which is then only dropped if it is
+    still empty. A table left over by an interrupted run still holds its
+    rows and is archived again instead of being exchanged back; an empty
+    one writes no archive.
+    """
+    retired = f"tweets_retired_{name}"
+    if not table_exists(cursor, retired):
+        cursor.execute(f"CREATE TABLE {retired} LIKE tweets")
+        cursor.execute(f"ALTER TABLE {retired} REMOVE PARTITIONING")
+        cursor.execute(f"ALTER TABLE tweets EXCHANGE PARTITION {name} WITH TABLE {retired}")
+        bump_job_versions(connection, cursor, owning_jobs(cursor, retired))
+
+    cursor.execute(f"SELECT 1 FROM {retired} LIMIT 1")
+    archived = archive_table(connection, retired, name, archive_dir) if cursor.fetchall() else 0
+    cursor.execute(f"DROP TABLE {retired}")
+    return archived
+
+def apply_retention(params):
+    """Drop, or archive and drop, monthly partitions older than the retention window"""
+    try:
+        keep_months = int(params.get('keepMonths', 12))
+        archive_dir = params.get('archiveDir')
+
+        connection = connect_to_db()
+        cursor = connection.cursor()
+
+        cutoff = month_start(date.today(), -keep_months)
+        partitions = get_monthly_partitions(cursor)
+        if not partitions:
+            return {"error": "Table 'tweets' is not partitioned"}
+
+        expired = [partition for partition in partitions if partition["month"] < cutoff]
+        # Always keep at least one partition, the table cannot lose all of them
+        if len(expired) == len(partitions):
+            expired = expired[:-1]
+
+        dropped = []
+        skipped = []
+        for partition in expired:
+            name = partition["name"]
+            archived = None
+            if archive_dir:
+                archived = retire_partition(connection, cursor, name, archive_dir)
+                cursor.execute(f"SELECT 1 FROM tweets PARTITION ({name}) LIMIT 1")
+                if cursor.fetchall():
+                    # Rows arrived after the exchange, they are archived by the next run
+                    skipped.append(name)
+                    continue
+                job_ids = []
+            else:
+                job_ids = owning_jobs(cursor, f"tweets PARTITION ({name})")
+            # Dropping a partition is a metadata operation, no row-by-row delete
+            cursor.execute(f"ALTER TABLE tweets DROP PARTITION {name}")
+            bump_job_versions(connection, cursor, job_ids)
+            dropped.append({"partition": name, "archivedRows": archived})
+
+        return {"success": True, "cutoff": cutoff.isoformat(), "dropped": dropped, "notEmpty": skipped}
+
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def get_partition_status():
+    """List the monthly partitions with their approximate row counts"""
+    try:
+        connection = connect_to_db()
+        cursor = connection.cursor()
+
+        partitions = get_monthly_partitions(cursor)
+        for partition in partitions:
+            partition["month"] = partition["month"].isoformat()
+
+        return {"success": True, "partitioned": bool(partitions), "partitions": partitions}
+
+    except Error as e:
+        return {"error": f"Database error: {str(e)}"}
+    finally:
+        if 'connection' in locals() and connection.is_connected():
+            cursor.close()
+            connection.close()
+
+def main():
+    """Main function to handle partition maintenance"""
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Operation is required"}))
+        return
+
+    operation = sys.argv[1]
+
+    # Parse parameters if provided
+    params = {}
+    if len(sys.argv) > 2:
+        try:
+            params = json.loads(sys.argv[2])
+        except json.JSONDecodeError:
+            print(json.dumps({"error": "Invalid JSON parameters"}))
+            return
+
+    result = {"error": "Unknown operation"}
+
+    if operation == "status":
+        result = get_partition_status()
+    elif operation == "add_partitions":
+        result = add_partitions(params)
+    elif operation == "retain":
+        result = apply_retention(params)
+
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
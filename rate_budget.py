@@ -0,0 +1,63 @@
+import asyncio
+import time
+from collections import deque
+
+# Requests allowed per 15 minute window for the Twitter endpoints we call,
+# matching twitter-scraper-app/src/utils/rateLimits.ts
+ENDPOINT_RATE_LIMITS = {
+    'UserByScreenName': 95,
+    'SearchTimeline': 50,
+    'UserTweets': 50,
+    'UserTweetsAndReplies': 50,
+    'UserMedia': 500,
+    'Likes': 500,
+    'TweetDetail': 150,
+    'TweetResultsByRestIds': 150
+}
+
+# Length of a rate limit window in seconds
+RATE_LIMIT_WINDOW = 15 * 60
+
+# Endpoint used by get_user_tweets for each tweet type
+USER_TIMELINE_ENDPOINTS = {
+    'Tweets': 'UserTweets',
+    'Replies': 'UserTweetsAndReplies',
+    'Media': 'UserMedia',
+    'Likes': 'Likes'
+}
+
+class RateBudget:
+    """Sliding-window request budget for one endpoint, shared by concurrent tasks"""
+
+    def __init__(self, endpoint: str, limit: int = None, window: float = RATE_LIMIT_WINDOW):
+        self.endpoint = endpoint
+        self.limit = limit or ENDPOINT_RATE_LIMITS.get(endpoint, 50)
+        self.window = window
+        self.requests = deque()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a request fits in the budget, then record it"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                # Forget requests that have left the window
+                while self.requests and now - self.requests[0] >= self.window:
+                    self.requests.popleft()
+                if len(self.requests) < self.limit:
+                    self.requests.append(now)
+                    return
+                wait = self.window - (now - self.requests[0])
+                print(f"Rate budget for {self.endpoint} exhausted, waiting {wait:.0f}s")
+                await asyncio.sleep(wait)
+
+class RateBudgets:
+    """Lazily created RateBudget per endpoint"""
+
+    def __init__(self):
+        self.budgets = {}
+
+    def get(self, endpoint: str) -> RateBudget:
+        if endpoint not in self.budgets:
+            self.budgets[endpoint] = RateBudget(endpoint)
+        return self.budgets[endpoint]
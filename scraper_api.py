@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import sys
+import os
 import json
 import asyncio
 from tweet_scraper_service import TweetScraperService
@@ -12,6 +13,126 @@ def parse_date(date_str):
         return None
     return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
 
+# Directory for the output of jobs that run after being announced
+LOG_DIR = os.getenv('SCRAPER_LOG_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+
+def announce_job(job_id):
+    """
+    Report the new job ID before scraping starts so the caller can return early
+
+    The caller only reads this line. Everything printed afterwards goes to a
+    per-job log file, so the scrape keeps running (and can still mark the job
+    FAILED) when the caller exits and its end of the pipe is closed.
+    """
+    try:
+        print(json.dumps({"success": True, "jobId": job_id, "status": "RUNNING"}), flush=True)
+    except BrokenPipeError:
+        pass
+    redirect_output(job_id)
+
+def redirect_output(job_id):
+    """Point stdout and stderr, including the file descriptors, at the job's log file"""
+    try:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        log_file = open(os.path.join(LOG_DIR, f"job_{job_id}.log"), 'a', buffering=1)
+    except OSError:
+        log_file = open(os.devnull, 'w')
+    for stream, fd in ((sys.stdout, 1), (sys.stderr, 2)):
+        try:
+            stream.flush()
+        except OSError:
+            pass
+        os.dup2(log_file.fileno(), fd)
+    sys.stdout = log_file
+    sys.stderr = log_file
+
+def queue_enabled():
+    """Whether jobs are queued for worker.py instead of being run in this process"""
+    return os.getenv('JOB_QUEUE', '').lower() in ('1', 'true', 'yes')
+
+async def run_job(scraper, job_id, job_type, query, parameters, worker_id=None):
+    """
+    Execute an existing job row with an initialized scraper and build the API response
+
+    A queued job passes the id of the worker that claimed it; the job's status
+    and progress writes then only apply while that worker still owns it.
+    """
+    if worker_id is not None:
+        scraper.job_owners[job_id] = worker_id
+    try:
+        return await dispatch_job(scraper, job_id, job_type, query, parameters)
+    finally:
+        scraper.job_owners.pop(job_id, None)
+
+async def dispatch_job(scraper, job_id, job_type, query, parameters):
+    """Run the scraper method for the job type and build the API response"""
+    target_count = int(parameters.get('target_count', 30))
+    
+    if job_type == 'SEARCH_TWEETS':
+        result = await scraper.search_tweets(job_id, query, parameters.get('search_type', 'Latest'), target_count)
+    elif job_type in ('HASHTAG_TOP_TWEETS', 'HASHTAG_LATEST_TWEETS'):
+        result = await scraper.search_hashtag_tweets(job_id, query, parameters.get('search_type', 'Latest'), target_count)
+    elif job_type == 'DATE_RANGE_TWEETS':
+        result = await scraper.search_date_range_tweets(job_id, query, parse_date(parameters['start_date']),
+                                                        parse_date(parameters['end_date']), target_count)
+    elif job_type == 'USER_TWEETS':
+        result = await scraper.search_user_tweets(job_id, query, parameters.get('tweet_type', 'Tweets'), target_count)
+    elif job_type == 'MULTI_USER_TWEETS':
+        result = await scraper.search_multi_user_tweets(job_id, parameters['usernames'],
+                                                        parameters.get('tweet_type', 'Tweets'), target_count,
+                                                        int(parameters.get('concurrency', 5)))
+    elif job_type == 'THREAD_EXPANSION':
+        result = await scraper.expand_threads(job_id, parameters['tweet_ids'], not parameters.get('source_job_id'),
+                                              int(parameters.get('max_depth', 3)), int(parameters.get('max_replies', 50)),
+                                              target_count, int(parameters.get('concurrency', 3)))
+    elif job_type == 'METRICS_REFRESH':
+        result = await scraper.refresh_metrics(job_id, parameters.get('source_job_id'), target_count,
+                                               int(parameters.get('max_age_days', 7)),
+                                               int(parameters.get('min_interval_minutes', 60)))
+    else:
+        error = f"Unknown job type: {job_type}"
+        scraper.update_job_status(job_id, 'FAILED', 0, {"error": error})
+        return {"error": error, "jobId": job_id}
+    
+    response = {
+        "success": "error" not in result,
+        "jobId": job_id,
+        "tweetCount": result['tweet_count'],
+        "duplicateCount": result['duplicate_count']
+    }
+    if job_type == 'MULTI_USER_TWEETS':
+        response["users"] = result.get('users', {})
+    if job_type in ('MULTI_USER_TWEETS', 'THREAD_EXPANSION'):
+        response["failures"] = result.get('failures', {})
+    if job_type == 'METRICS_REFRESH':
+        response["changedCount"] = result.get('changed_count', 0)
+        response["missingCount"] = result.get('missing_count', 0)
+    return response
+
+async def start_job(scraper, job_type, query, parameters):
+    """Queue the job for a worker, or create and run it in this process"""
+    if queue_enabled():
+        job_id = scraper.create_job(job_type=job_type, query=query, parameters=parameters, status='PENDING')
+        if not job_id:
+            return {"error": "Failed to create job"}
+        return {"success": True, "jobId": job_id, "status": "PENDING"}
+    
+    initialized = await scraper.initialize()
+    
+    if not initialized:
+        return {"error": "Failed to initialize Twitter client"}
+    
+    # Create a job
+    job_id = scraper.create_job(job_type=job_type, query=query, parameters=parameters)
+    
+    if not job_id:
+        return {"error": "Failed to create job"}
+    
+    announce_job(job_id)
+    
+    # Execute the job
+    return await run_job(scraper, job_id, job_type, query, parameters)
+
 async def handle_search_tweets(params):
     """Handle search tweets request"""
     try:
@@ -22,34 +143,11 @@ async def handle_search_tweets(params):
         if not query:
             return {"error": "Query is required"}
         
-        # Initialize the scraper service
         scraper = TweetScraperService()
-        initialized = await scraper.initialize()
-        
-        if not initialized:
-            return {"error": "Failed to initialize Twitter client"}
-        
-        # Create a job
-        job_id = scraper.create_job(
-            job_type='SEARCH_TWEETS',
-            query=query,
-            parameters={
-                'search_type': search_type,
-                'target_count': target_count
-            }
-        )
-        
-        if not job_id:
-            return {"error": "Failed to create job"}
-        
-        # Execute the search
-        tweet_count = await scraper.search_tweets(job_id, query, search_type, target_count)
-        
-        return {
-            "success": True,
-            "jobId": job_id,
-            "tweetCount": tweet_count
-        }
+        return await start_job(scraper, 'SEARCH_TWEETS', query, {
+            'search_type': search_type,
+            'target_count': target_count
+        })
         
     except Exception as e:
         return {"error": str(e)}
@@ -63,35 +161,11 @@ async def handle_hashtag_tweets(params, search_type='Latest'):
         if not hashtag:
             return {"error": "Hashtag is required"}
         
-        # Initialize the scraper service
         scraper = TweetScraperService()
-        initialized = await scraper.initialize()
-        
-        if not initialized:
-            return {"error": "Failed to initialize Twitter client"}
-        
-        # Create a job
-        job_type = f"HASHTAG_{search_type.upper()}_TWEETS"
-        job_id = scraper.create_job(
-            job_type=job_type,
-            query=hashtag,
-            parameters={
-                'search_type': search_type,
-                'target_count': target_count
-            }
-        )
-        
-        if not job_id:
-            return {"error": "Failed to create job"}
-        
-        # Execute the search
-        tweet_count = await scraper.search_hashtag_tweets(job_id, hashtag, search_type, target_count)
-        
-        return {
-            "success": True,
-            "jobId": job_id,
-            "tweetCount": tweet_count
-        }
+        return await start_job(scraper, f"HASHTAG_{search_type.upper()}_TWEETS", hashtag, {
+            'search_type': search_type,
+            'target_count': target_count
+        })
         
     except Exception as e:
         return {"error": str(e)}
@@ -110,42 +184,16 @@ async def handle_date_range_tweets(params):
         if not start_date_str or not end_date_str:
             return {"error": "Start date and end date are required"}
         
-        # Parse dates
-        start_date = parse_date(start_date_str)
-        end_date = parse_date(end_date_str)
-        
-        if not start_date or not end_date:
+        # Validate dates before the job is created
+        if not parse_date(start_date_str) or not parse_date(end_date_str):
             return {"error": "Invalid date format"}
         
-        # Initialize the scraper service
         scraper = TweetScraperService()
-        initialized = await scraper.initialize()
-        
-        if not initialized:
-            return {"error": "Failed to initialize Twitter client"}
-        
-        # Create a job
-        job_id = scraper.create_job(
-            job_type='DATE_RANGE_TWEETS',
-            query=query,
-            parameters={
-                'start_date': start_date_str,
-                'end_date': end_date_str,
-                'target_count': target_count
-            }
-        )
-        
-        if not job_id:
-            return {"error": "Failed to create job"}
-        
-        # Execute the search
-        tweet_count = await scraper.search_date_range_tweets(job_id, query, start_date, end_date, target_count)
-        
-        return {
-            "success": True,
-            "jobId": job_id,
-            "tweetCount": tweet_count
-        }
+        return await start_job(scraper, 'DATE_RANGE_TWEETS', query, {
+            'start_date': start_date_str,
+            'end_date': end_date_str,
+            'target_count': target_count
+        })
         
     except Exception as e:
         return {"error": str(e)}
@@ -160,34 +208,102 @@ async def handle_user_tweets(params):
         if not screen_name:
             return {"error": "Username is required"}
         
-        # Initialize the scraper service
         scraper = TweetScraperService()
-        initialized = await scraper.initialize()
+        return await start_job(scraper, 'USER_TWEETS', screen_name, {
+            'tweet_type': tweet_type,
+            'target_count': target_count
+        })
         
-        if not initialized:
-            return {"error": "Failed to initialize Twitter client"}
+    except Exception as e:
+        return {"error": str(e)}
+
+async def handle_multi_user_tweets(params):
+    """Handle multi-user tweets request"""
+    try:
+        usernames = params.get('usernames', [])
+        tweet_type = params.get('tweetType', 'Tweets')
+        target_count = int(params.get('count', 30))
+        concurrency = int(params.get('concurrency', 5))
         
-        # Create a job
-        job_id = scraper.create_job(
-            job_type='USER_TWEETS',
-            query=screen_name,
-            parameters={
-                'tweet_type': tweet_type,
-                'target_count': target_count
-            }
-        )
+        # Accept a list or a comma/whitespace separated string
+        if isinstance(usernames, str):
+            usernames = usernames.replace(',', ' ').split()
+        screen_names = [name.lstrip('@') for name in usernames if name.strip()]
         
-        if not job_id:
-            return {"error": "Failed to create job"}
+        if not screen_names:
+            return {"error": "At least one username is required"}
+        
+        # The query column holds a readable summary of the list
+        summary = f"{len(screen_names)} users: {', '.join(screen_names)}"
+        scraper = TweetScraperService()
+        return await start_job(scraper, 'MULTI_USER_TWEETS',
+                               summary[:252] + '...' if len(summary) > 255 else summary, {
+            'usernames': screen_names,
+            'tweet_type': tweet_type,
+            'target_count': target_count,
+            'concurrency': concurrency
+        })
+        
+    except Exception as e:
+        return {"error": str(e)}
+
+async def handle_thread_expansion(params):
+    """Handle thread expansion request"""
+    try:
+        source_job_id = params.get('jobId')
+        tweet_ids = params.get('tweetIds', [])
+        max_depth = int(params.get('maxDepth', 3))
+        max_replies = int(params.get('maxReplies', 50))
+        max_tweets = int(params.get('count', 1000))
+        max_seeds = int(params.get('maxSeeds', 100))
+        concurrency = int(params.get('concurrency', 3))
+        
+        # Accept a list or a comma/whitespace separated string
+        if isinstance(tweet_ids, str):
+            tweet_ids = tweet_ids.replace(',', ' ').split()
+        tweet_ids = [str(tweet_id) for tweet_id in tweet_ids]
+        
+        if not source_job_id and not tweet_ids:
+            return {"error": "Job ID or tweet IDs are required"}
         
-        # Execute the search
-        tweet_count = await scraper.search_user_tweets(job_id, screen_name, tweet_type, target_count)
+        scraper = TweetScraperService()
+        
+        # Seed from the job's tweets that have replies, they are already stored
+        if source_job_id:
+            tweet_ids = scraper.get_thread_seeds(int(source_job_id), max_seeds)
+            if not tweet_ids:
+                return {"error": "No tweets with replies found for this job"}
+        
+        summary = f"job {source_job_id}" if source_job_id else ', '.join(tweet_ids)
+        return await start_job(scraper, 'THREAD_EXPANSION',
+                               summary[:252] + '...' if len(summary) > 255 else summary, {
+            'source_job_id': source_job_id,
+            'tweet_ids': tweet_ids,
+            'max_depth': max_depth,
+            'max_replies': max_replies,
+            'target_count': max_tweets,
+            'concurrency': concurrency
+        })
+        
+    except Exception as e:
+        return {"error": str(e)}
+
+async def handle_metrics_refresh(params):
+    """Handle engagement metrics refresh request"""
+    try:
+        source_job_id = params.get('jobId')
+        target_count = int(params.get('count', 1000))
+        max_age_days = int(params.get('maxAgeDays', 7))
+        min_interval_minutes = int(params.get('minIntervalMinutes', 60))
         
-        return {
-            "success": True,
-            "jobId": job_id,
-            "tweetCount": tweet_count
-        }
+        scraper = TweetScraperService()
+        return await start_job(scraper, 'METRICS_REFRESH',
+                               f"job {source_job_id}" if source_job_id else f"last {max_age_days} days", {
+            'source_job_id': int(source_job_id) if source_job_id else None,
+            'target_count': target_count,
+            'max_age_days': max_age_days,
+            'min_interval_minutes': min_interval_minutes
+        })
         
     except Exception as e:
         return {"error": str(e)}
@@ -219,9 +335,16 @@ async def main():
         result = await handle_date_range_tweets(params)
     elif job_type == 'USER_TWEETS':
         result = await handle_user_tweets(params)
+    elif job_type == 'MULTI_USER_TWEETS':
+        result = await handle_multi_user_tweets(params)
+    elif job_type == 'THREAD_EXPANSION':
+        result = await handle_thread_expansion(params)
+    elif job_type == 'METRICS_REFRESH':
+        result = await handle_metrics_refresh(params)
     
-    # Print the result as JSON to be captured by the Node.js process
-    print(json.dumps(result))
+    # Print the final result as JSON; the Node.js process has usually already
+    # returned the announced job ID (or the queued job) and only logs this line
+    print(json.dumps(result), flush=True)
 
 if __name__ == '__main__':
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,60 @@
+import hashlib
+import math
+
+# Jobs targeting more tweets than this track seen ids in a Bloom filter
+EXACT_SET_LIMIT = 1000000
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string ids"""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.001):
+        expected_items = max(expected_items, 1)
+        self.size = max(8, math.ceil(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Double hashing derives all probe positions from one digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str) -> bool:
+        """Add an item, returning False if it was (probably) already present"""
+        added = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+class SeenIds:
+    """
+    Ids already seen by a job.
+
+    Normal jobs use an exact set. Very large crawls use a Bloom filter sized
+    for the target count, which keeps memory flat at the cost of dropping a
+    small fraction (false_positive_rate) of genuinely new tweets.
+    """
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.001):
+        if expected_items > EXACT_SET_LIMIT:
+            self.ids = BloomFilter(expected_items, false_positive_rate)
+        else:
+            self.ids = set()
+
+    @property
+    def is_exact(self) -> bool:
+        return isinstance(self.ids, set)
+
+    def add(self, tweet_id) -> bool:
+        """Record an id, returning True if it had not been seen before"""
+        tweet_id = str(tweet_id)
+        if self.is_exact:
+            if tweet_id in self.ids:
+                return False
+            self.ids.add(tweet_id)
+            return True
+        return self.ids.add(tweet_id)
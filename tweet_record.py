@@ -0,0 +1,129 @@
+import json
+import os
+import re
+from datetime import datetime, timezone
+from analytics_rollups import apply_rollups
+from metrics_history import record_metric_changes
+
+# Hashtags are extracted from the tweet text
+HASHTAG_PATTERN = re.compile(r'#(\w+)')
+
+# Columns written by every writer of the tweets table, in to_row order
+TWEET_COLUMNS = """
+    id, job_id, user_name, user_id, text, created_at, reply_count, retweet_count,
+    bookmark_count, hashtags, raw_data
+"""
+
+# Upsert clause shared by every writer. It reuses the inserted values so each
+# row only carries 11 parameters, and keeps indexed_at of existing tweets.
+TWEET_UPSERT_CLAUSE = """
+    ON DUPLICATE KEY UPDATE
+    job_id = VALUES(job_id),
+    user_name = VALUES(user_name),
+    text = VALUES(text),
+    reply_count = VALUES(reply_count),
+    retweet_count = VALUES(retweet_count),
+    bookmark_count = VALUES(bookmark_count),
+    hashtags = VALUES(hashtags),
+    raw_data = VALUES(raw_data),
+    metrics_checked_at = CURRENT_TIMESTAMP
+"""
+
+INSERT_TWEET_SQL = f"""
+    INSERT INTO tweets ({TWEET_COLUMNS})
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    {TWEET_UPSERT_CLAUSE}
+"""
+
+# Timestamp format used by the Twitter API, e.g. "Wed Oct 10 20:19:24 +0000 2018"
+TWITTER_DATE_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+def format_created_at(value) -> str:
+    """Normalize a datetime or Twitter/ISO timestamp string to a UTC MySQL DATETIME string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.strptime(value, TWITTER_DATE_FORMAT)
+        except ValueError:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+def tweets_partitioned() -> bool:
+    """Whether the tweets table is range partitioned on created_at, which makes it NOT NULL"""
+    return os.getenv('TWEETS_PARTITIONING', '').lower() == 'monthly'
+
+def extract_hashtags(text: str) -> tuple:
+    """Extract hashtags from tweet text"""
+    return tuple(HASHTAG_PATTERN.findall(text or ''))
+
+class TweetRecord:
+    """Compact record holding only the persisted fields of a tweet"""
+
+    __slots__ = ('id', 'user_name', 'user_id', 'text', 'created_at',
+                 'reply_count', 'retweet_count', 'bookmark_count', 'hashtags')
+
+    def __init__(self, id, user_name, user_id, text, created_at=None,
+                 reply_count=0, retweet_count=0, bookmark_count=0, hashtags=None):
+        self.id = id
+        self.user_name = user_name
+        self.user_id = user_id
+        self.text = text
+        self.created_at = created_at
+        self.reply_count = reply_count
+        self.retweet_count = retweet_count
+        self.bookmark_count = bookmark_count
+        self.hashtags = extract_hashtags(text) if hashtags is None else hashtags
+
+    @classmethod
+    def from_tweet(cls, tweet) -> 'TweetRecord':
+        """Convert a twikit Tweet once, so the full object can be released"""
+        # twikit exposes the parsed timestamp as created_at_datetime
+        created_at = getattr(tweet, 'created_at_datetime', None) or getattr(tweet, 'created_at', None)
+        return cls(
+            id=tweet.id,
+            user_name=tweet.user.name,
+            user_id=tweet.user.id,
+            text=tweet.text,
+            created_at=format_created_at(created_at),
+            reply_count=getattr(tweet, 'reply_count', 0),
+            retweet_count=getattr(tweet, 'retweet_count', 0),
+            bookmark_count=getattr(tweet, 'bookmark_count', 0)
+        )
+
+    def to_dict(self) -> dict:
+        """Serializable version of the tweet, stored as raw_data"""
+        return {
+            'id': self.id,
+            'text': self.text,
+            'user_name': self.user_name,
+            'user_id': self.user_id,
+            'created_at': self.created_at,
+            'reply_count': self.reply_count,
+            'retweet_count': self.retweet_count,
+            'bookmark_count': self.bookmark_count
+        }
+
+    def to_row(self, job_id: int) -> tuple:
+        """Build the parameter tuple for INSERT_TWEET_SQL"""
+        return (
+            self.id, job_id, self.user_name, self.user_id, self.text,
+            self.created_at, self.reply_count, self.retweet_count, self.bookmark_count,
+            json.dumps(list(self.hashtags)), json.dumps(self.to_dict())
+        )
+
+# Rows per multi-row INSERT, keeps statements well under max_allowed_packet
+INSERT_CHUNK_SIZE = 1000
+
+def insert_tweet_records(cursor, job_id: int, records) -> int:
+    """Upsert a batch of records, their rollups and metric history in multi-row INSERT chunks"""
+    for start in range(0, len(records), INSERT_CHUNK_SIZE):
+        # Parameter tuples only exist for one chunk at a time
+        chunk = records[start:start + INSERT_CHUNK_SIZE]
+        # Rollups and metric history read the previous rows, so they run before the upsert
+        previous = apply_rollups(cursor, job_id, chunk)
+        record_metric_changes(cursor, previous, chunk)
+        cursor.executemany(INSERT_TWEET_SQL, [record.to_row(job_id) for record in chunk])
+    return len(records)
@@ -8,11 +8,30 @@ import mysql.connector
 from mysql.connector import Error
 from datetime import datetime
 import pytz
-import re
+from tweet_record import TweetRecord, insert_tweet_records, tweets_partitioned
+from seen_ids import SeenIds
+from rate_budget import RateBudget, RateBudgets, USER_TIMELINE_ENDPOINTS
+from change_feed import publish_batch, commit_batch
+from metrics_history import record_metric_changes
 
 # Load environment variables
 load_dotenv()
 
+# Consecutive pages without a new tweet before pagination gives up
+MAX_DUPLICATE_PAGES = 3
+
+# Consecutive pages that fail to save before pagination gives up
+MAX_FAILED_SAVES = 3
+
+# Tweets from completed timelines buffered before a shared batch write
+MULTI_USER_BATCH_SIZE = 500
+
+# Reply tweets buffered before a thread expansion batch write
+THREAD_BATCH_SIZE = 200
+
+# Tweet ids looked up per TweetResultsByRestIds request by a metrics refresh
+METRICS_BATCH_SIZE = 100
+
 class TweetScraperService:
     def __init__(self):
         self.client = Client('en-US')
@@ -26,6 +45,12 @@ class TweetScraperService:
         self.db_password = os.getenv('DB_PASSWORD', '')
         self.db_name = 'xdb'
         
+        # Per-endpoint request budgets shared by every job run by this instance
+        self.rate_budgets = RateBudgets()
+        
+        # Worker id per queued job being run by this instance, fencing its job writes
+        self.job_owners = {}
+        
         if not all([self.username, self.email, self.password]):
             raise ValueError("Missing Twitter credentials. Check your .env file.")
 
@@ -61,8 +86,9 @@ class TweetScraperService:
             print(f"Error connecting to MySQL database: {e}")
             return None
 
-    def create_job(self, job_type: str, query: str, parameters: Dict = None) -> Optional[int]:
-        """Create a new scraping job in the database"""
+    def create_job(self, job_type: str, query: str, parameters: Dict = None,
+                   status: str = 'RUNNING') -> Optional[int]:
+        """Create a new scraping job in the database, or queue it with status PENDING"""
         try:
             connection = self.connect_to_db()
             if connection is None:
@@ -80,7 +106,7 @@ class TweetScraperService:
                 VALUES (%s, %s, %s, %s, %s)
             """
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute(query_sql, (job_type, query, params_json, current_time, 'RUNNING'))
+            cursor.execute(query_sql, (job_type, query, params_json, current_time, status))
             
             # Get the job_id of the newly created job
             job_id = cursor.lastrowid
@@ -97,29 +123,47 @@ class TweetScraperService:
                 cursor.close()
                 connection.close()
 
-    def update_job_status(self, job_id: int, status: str, tweet_count: int = None):
-        """Update the status of a scraping job"""
+    def owner_fence(self, job_id: int, worker_id: str = None):
+        """
+        WHERE clause suffix and parameters limiting a job write to its owner
+
+        Queued jobs are only written while the worker still owns them, so a
+        worker whose job was reaped and claimed by another cannot overwrite
+        the new run's status or progress. Jobs run directly have no owner.
+        """
+        worker_id = worker_id or self.job_owners.get(job_id)
+        if worker_id is None:
+            return "", ()
+        return " AND worker_id = %s", (worker_id,)
+
+    def update_job_status(self, job_id: int, status: str, tweet_count: int = None, result: Dict = None,
+                          worker_id: str = None):
+        """Update the status of a scraping job, if still owned by worker_id for queued jobs"""
         try:
             connection = self.connect_to_db()
             if connection is None:
                 return
                 
             cursor = connection.cursor()
+            fence, fence_params = self.owner_fence(job_id, worker_id)
             
             if status == 'COMPLETED' or status == 'FAILED':
-                # Update status and end time for completed or failed jobs
+                # Update status, end time and the job result for completed or failed jobs
                 current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                result_json = json.dumps(result) if result else None
                 query = """
                     UPDATE scraping_jobs 
-                    SET status = %s, end_time = %s, tweet_count = %s
+                    SET status = %s, end_time = %s, tweet_count = COALESCE(%s, tweet_count), result = %s
                     WHERE job_id = %s
-                """
-                cursor.execute(query, (status, current_time, tweet_count, job_id))
+                """ + fence
+                cursor.execute(query, (status, current_time, tweet_count, result_json, job_id) + fence_params)
             else:
                 # Just update status for other states
-                query = "UPDATE scraping_jobs SET status = %s WHERE job_id = %s"
-                cursor.execute(query, (status, job_id))
+                query = "UPDATE scraping_jobs SET status = %s WHERE job_id = %s" + fence
+                cursor.execute(query, (status, job_id) + fence_params)
                 
+            if fence and cursor.rowcount == 0:
+                print(f"Job {job_id} is no longer owned by this worker, status {status} not recorded")
             connection.commit()
             
         except Error as e:
@@ -129,68 +173,195 @@ class TweetScraperService:
                 cursor.close()
                 connection.close()
 
-    def save_tweets(self, job_id: int, tweets: List):
-        """Save tweets to the database"""
+    def update_job_progress(self, job_id: int, tweet_count: int):
+        """Record the running tweet count and the time of the last saved page"""
         try:
             connection = self.connect_to_db()
             if connection is None:
                 return
+
+            cursor = connection.cursor()
+
+            fence, fence_params = self.owner_fence(job_id)
+            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            query = """
+                UPDATE scraping_jobs
+                SET tweet_count = %s, last_page_at = %s
+                WHERE job_id = %s
+            """ + fence
+            cursor.execute(query, (tweet_count, current_time, job_id) + fence_params)
+            connection.commit()
+
+        except Error as e:
+            print(f"Error updating job progress: {e}")
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def claim_job(self, worker_id: str) -> Optional[Dict]:
+        """
+        Claim the oldest PENDING job for this worker
+
+        SKIP LOCKED lets any number of workers claim concurrently: each one
+        skips rows another worker has locked instead of waiting on them.
+        Times come from the database clock so workers on different hosts agree.
+        """
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return None
+
+            cursor = connection.cursor(dictionary=True)
+
+            connection.start_transaction()
+            cursor.execute("""
+                SELECT job_id, job_type, query, parameters, attempts
+                FROM scraping_jobs
+                WHERE status = 'PENDING'
+                ORDER BY job_id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """)
+            job = cursor.fetchone()
+            if job is None:
+                connection.rollback()
+                return None
+
+            cursor.execute("""
+                UPDATE scraping_jobs
+                SET status = 'RUNNING', worker_id = %s, heartbeat_at = NOW(),
+                    start_time = NOW(), attempts = attempts + 1
+                WHERE job_id = %s
+            """, (worker_id, job['job_id']))
+            connection.commit()
+
+            if isinstance(job['parameters'], str):
+                job['parameters'] = json.loads(job['parameters'])
+            job['parameters'] = job['parameters'] or {}
+            job['attempts'] += 1
+            print(f"Worker {worker_id} claimed job {job['job_id']} (attempt {job['attempts']})")
+            return job
+
+        except Error as e:
+            print(f"Error claiming job: {e}")
+            return None
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def heartbeat_job(self, job_id: int, worker_id: str) -> bool:
+        """Refresh a running job's heartbeat, returning False if this worker no longer owns it"""
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                # Keep running, the reaper decides if the heartbeat is too old
+                return True
+
+            cursor = connection.cursor()
+            cursor.execute("""
+                UPDATE scraping_jobs
+                SET heartbeat_at = NOW()
+                WHERE job_id = %s AND worker_id = %s AND status = 'RUNNING'
+            """, (job_id, worker_id))
+            connection.commit()
+            return cursor.rowcount > 0
+
+        except Error as e:
+            print(f"Error sending heartbeat: {e}")
+            return True
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def release_job(self, job_id: int, worker_id: str):
+        """Put a job this worker is abandoning (e.g. on shutdown) back in the queue"""
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return
+
+            cursor = connection.cursor()
+            cursor.execute("""
+                UPDATE scraping_jobs
+                SET status = 'PENDING', worker_id = NULL, heartbeat_at = NULL
+                WHERE job_id = %s AND worker_id = %s AND status = 'RUNNING'
+            """, (job_id, worker_id))
+            connection.commit()
+
+        except Error as e:
+            print(f"Error releasing job: {e}")
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def reap_stale_jobs(self, stale_after: int, max_attempts: int) -> Dict:
+        """
+        Requeue RUNNING jobs whose worker stopped heartbeating
+
+        Jobs that have already used max_attempts are marked FAILED instead.
+        Jobs run directly by scraper_api have no heartbeat and are never reaped.
+        """
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return {"requeued": 0, "failed": 0}
+
+            cursor = connection.cursor()
+
+            cursor.execute("""
+                UPDATE scraping_jobs
+                SET status = 'FAILED', end_time = NOW(), worker_id = NULL,
+                    result = JSON_OBJECT('error', 'Worker stopped responding', 'attempts', attempts)
+                WHERE status = 'RUNNING' AND heartbeat_at < NOW() - INTERVAL %s SECOND
+                AND attempts >= %s
+            """, (stale_after, max_attempts))
+            failed = cursor.rowcount
+
+            cursor.execute("""
+                UPDATE scraping_jobs
+                SET status = 'PENDING', worker_id = NULL, heartbeat_at = NULL
+                WHERE status = 'RUNNING' AND heartbeat_at < NOW() - INTERVAL %s SECOND
+            """, (stale_after,))
+            requeued = cursor.rowcount
+            connection.commit()
+
+            if failed or requeued:
+                print(f"Reaper requeued {requeued} and failed {failed} stale jobs")
+            return {"requeued": requeued, "failed": failed}
+
+        except Error as e:
+            print(f"Error reaping stale jobs: {e}")
+            return {"requeued": 0, "failed": 0}
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def save_tweets(self, job_id: int, records: List[TweetRecord]):
+        """Save tweet records to the database"""
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return 0
                 
             cursor = connection.cursor()
-            tweets_saved = 0
             
-            for tweet in tweets:
-                # Extract hashtags from tweet text
-                hashtags = re.findall(r'#(\w+)', tweet.text)
-                
-                # Create a serializable version of the tweet data
-                tweet_data = {
-                    'id': tweet.id,
-                    'text': tweet.text,
-                    'user_name': tweet.user.name,
-                    'user_id': tweet.user.id,
-                    'created_at': tweet.created_at.strftime('%Y-%m-%d %H:%M:%S') if hasattr(tweet, 'created_at') else None,
-                    'reply_count': getattr(tweet, 'reply_count', 0),
-                    'retweet_count': getattr(tweet, 'retweet_count', 0),
-                    'bookmark_count': getattr(tweet, 'bookmark_count', 0)
-                }
-                
-                # Insert tweet data
-                query = """
-                    INSERT INTO tweets 
-                    (id, job_id, user_name, user_id, text, created_at, reply_count, retweet_count, 
-                     bookmark_count, hashtags, raw_data)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE
-                    job_id = %s,
-                    user_name = %s,
-                    text = %s,
-                    reply_count = %s,
-                    retweet_count = %s,
-                    bookmark_count = %s,
-                    hashtags = %s,
-                    raw_data = %s
-                """
-                
-                values = (
-                    tweet.id, job_id, tweet.user.name, tweet.user.id, tweet.text, 
-                    tweet_data['created_at'], tweet_data['reply_count'], 
-                    tweet_data['retweet_count'], tweet_data['bookmark_count'],
-                    json.dumps(hashtags), json.dumps(tweet_data),
-                    # For ON DUPLICATE KEY UPDATE
-                    job_id, tweet.user.name, tweet.text, 
-                    tweet_data['reply_count'], tweet_data['retweet_count'], 
-                    tweet_data['bookmark_count'], json.dumps(hashtags), json.dumps(tweet_data)
-                )
-                
-                cursor.execute(query, values)
-                tweets_saved += 1
-                
+            # Upsert the whole page in one batch
+            tweets_saved = insert_tweet_records(cursor, job_id, records)
+            
+            # Published as pending before commit, delivered once the marker follows
+            batch_id = publish_batch(job_id, records)
             connection.commit()
+            commit_batch(batch_id)
             print(f"Saved {tweets_saved} tweets to database")
             return tweets_saved
             
-        except Error as e:
+        except (Error, OSError) as e:
+            # Closing the connection without commit rolls the batch back
             print(f"Error saving tweets: {e}")
             return 0
         finally:
@@ -198,7 +369,130 @@ class TweetScraperService:
                 cursor.close()
                 connection.close()
 
-    async def search_tweets(self, job_id: int, query: str, search_type: str = 'Latest', target_count: int = 30):
+    async def iterate_unique_pages(self, fetch_first_page, target_count: int, label: str,
+                                   seen_ids: SeenIds, stats: Dict, rate_budget: RateBudget = None,
+                                   count_saved: bool = False):
+        """
+        Page through a tweet timeline, yielding pages of records not seen before
+        
+        Args:
+            fetch_first_page: Coroutine function returning the first page of tweets
+            target_count: Target number of unique tweets to yield
+            label: Description of the timeline used in log messages
+            seen_ids: Ids already seen by the job, updated in place
+            stats: Dict whose 'duplicate_count', 'skipped_count' and 'pages' are updated in place
+            rate_budget: Optional budget acquired before every page request
+            count_saved: Count progress towards the target by stats['tweet_count'],
+                         which the caller updates with the rows it saved, instead
+                         of by the records yielded
+        """
+        collected = 0
+        duplicate_pages = 0
+        page = 1
+        current_tweets = None
+        # Partitioned tables cannot store tweets without created_at
+        require_created_at = tweets_partitioned()
+
+        while collected < target_count:
+            if count_saved:
+                # Unsaved pages do not count, their ids are seen and cannot be refetched
+                collected = stats.get('tweet_count', 0)
+                if collected >= target_count:
+                    break
+            if rate_budget is not None:
+                await rate_budget.acquire()
+                
+            if page == 1:
+                # Get initial page of tweets
+                print(f"\nFetching initial page of {label}")
+                current_tweets = await fetch_first_page()
+            else:
+                print(f"\nFetching page {page} of {label}...")
+                current_tweets = await current_tweets.next()
+            stats['pages'] = stats.get('pages', 0) + 1
+            
+            if not current_tweets:
+                print("No more tweets available")
+                break
+
+            # Calculate how many tweets we can use without exceeding target
+            remaining = target_count - collected
+            
+            # Drop tweets already seen on earlier pages, converting the rest once
+            # into compact records used for saving and counting
+            records = []
+            for tweet in current_tweets:
+                if len(records) >= remaining:
+                    break
+                if seen_ids.add(tweet.id):
+                    record = TweetRecord.from_tweet(tweet)
+                    if require_created_at and record.created_at is None:
+                        stats['skipped_count'] = stats.get('skipped_count', 0) + 1
+                        continue
+                    records.append(record)
+                else:
+                    stats['duplicate_count'] = stats.get('duplicate_count', 0) + 1
+            
+            if records:
+                collected += len(records)
+                duplicate_pages = 0
+                yield records
+            else:
+                # Stop if the cursor keeps returning tweets we already have
+                duplicate_pages += 1
+                if duplicate_pages >= MAX_DUPLICATE_PAGES:
+                    print(f"\nNo new tweets in {duplicate_pages} consecutive pages, stopping")
+                    break
+            
+            page += 1
+
+    async def paginate_tweets(self, job_id: int, fetch_first_page, target_count: int, label: str,
+                              rate_budget: RateBudget = None) -> Dict:
+        """
+        Page through a tweet timeline, saving unique tweets until the target is reached
+        
+        Args:
+            job_id: The ID of the scraping job
+            fetch_first_page: Coroutine function returning the first page of tweets
+            target_count: Target number of unique tweets to save
+            label: Description of the timeline used in log messages
+            rate_budget: Optional budget acquired before every page request
+            
+        Returns:
+            Dict with the unique tweet count, the number of duplicates dropped, tweets
+            skipped for lacking created_at and pages read, plus failed_count and error
+            when pages could not be saved
+        """
+        result = {"tweet_count": 0, "duplicate_count": 0, "skipped_count": 0, "pages": 0, "failed_count": 0}
+        seen_ids = SeenIds(target_count)
+        failed_saves = 0
+
+        pages = self.iterate_unique_pages(fetch_first_page, target_count, label,
+                                          seen_ids, result, rate_budget, count_saved=True)
+        async for records in pages:
+            # Save tweets to database
+            saved = self.save_tweets(job_id, records)
+            result['tweet_count'] += saved
+            self.update_job_progress(job_id, result['tweet_count'])
+            
+            if saved != len(records):
+                result['failed_count'] += len(records) - saved
+                failed_saves += 1
+                if failed_saves >= MAX_FAILED_SAVES:
+                    result['error'] = f"Failed to save {failed_saves} consecutive pages"
+                    await pages.aclose()
+                    break
+            else:
+                failed_saves = 0
+            
+            print(f"\nTotal tweets fetched so far: {result['tweet_count']} "
+                  f"({result['duplicate_count']} duplicates dropped)")
+
+        if result['tweet_count'] >= target_count:
+            print(f"\nReached target count of {target_count} tweets")
+        return result
+
+    async def search_tweets(self, job_id: int, query: str, search_type: str = 'Latest', target_count: int = 30) -> Dict:
         """
         Search for tweets and save them to the database
         
@@ -209,48 +503,25 @@ class TweetScraperService:
             target_count: Target number of tweets to fetch
         """
         try:
-            total_tweets = 0
-            page = 1
-            current_tweets = None
-
-            while total_tweets < target_count:
-                if page == 1:
-                    # Get initial page of tweets
-                    current_tweets = await self.client.search_tweet(query, search_type)
-                    print(f"\nFetching initial page of tweets for query: {query}")
-                else:
-                    print(f"\nFetching page {page} of tweets...")
-                    current_tweets = await current_tweets.next()
-                
-                if not current_tweets:
-                    print("No more tweets available")
-                    break
-
-                # Calculate how many tweets we can use without exceeding target
-                remaining = target_count - total_tweets
-                tweets_to_use = current_tweets[:remaining]
-                
-                # Save tweets to database
-                saved_count = self.save_tweets(job_id, tweets_to_use)
-                total_tweets += saved_count
-                
-                print(f"\nTotal tweets fetched so far: {total_tweets}")
-                
-                if total_tweets >= target_count:
-                    print(f"\nReached target count of {target_count} tweets")
-                    break
-                
-                page += 1
+            print(f"\nSearching tweets for query: {query}")
+            result = await self.paginate_tweets(
+                job_id,
+                lambda: self.client.search_tweet(query, search_type),
+                target_count,
+                'tweets',
+                self.rate_budgets.get('SearchTimeline')
+            )
 
             # Update job status
-            self.update_job_status(job_id, 'COMPLETED', total_tweets)
-            print(f"\nFinal tweet count: {total_tweets}")
-            return total_tweets
+            status = 'FAILED' if 'error' in result else 'COMPLETED'
+            self.update_job_status(job_id, status, result['tweet_count'], result)
+            print(f"\nFinal tweet count: {result['tweet_count']}")
+            return result
                 
         except Exception as e:
             print(f"Error searching tweets: {e}")
-            self.update_job_status(job_id, 'FAILED')
-            return 0
+            self.update_job_status(job_id, 'FAILED', result={"error": str(e)})
+            return {"tweet_count": 0, "duplicate_count": 0, "error": str(e)}
 
     async def search_hashtag_tweets(self, job_id: int, hashtag: str, search_type: str = 'Latest', target_count: int = 30):
         """
@@ -293,10 +564,10 @@ class TweetScraperService:
                 
         except Exception as e:
             print(f"Error fetching tweets by date range: {e}")
-            self.update_job_status(job_id, 'FAILED')
-            return 0
+            self.update_job_status(job_id, 'FAILED', result={"error": str(e)})
+            return {"tweet_count": 0, "duplicate_count": 0, "error": str(e)}
 
-    async def search_user_tweets(self, job_id: int, screen_name: str, tweet_type: str = 'Tweets', target_count: int = 30):
+    async def search_user_tweets(self, job_id: int, screen_name: str, tweet_type: str = 'Tweets', target_count: int = 30) -> Dict:
         """
         Fetch tweets from a specific user
         
@@ -308,57 +579,516 @@ class TweetScraperService:
         """
         try:
             # First get the user ID
+            await self.rate_budgets.get('UserByScreenName').acquire()
             user = await self.client.get_user_by_screen_name(screen_name)
             if not user:
                 print(f"Could not find user: {screen_name}")
-                self.update_job_status(job_id, 'FAILED')
-                return 0
+                self.update_job_status(job_id, 'FAILED', result={"error": f"User not found: {screen_name}"})
+                return {"tweet_count": 0, "duplicate_count": 0, "error": f"User not found: {screen_name}"}
 
             user_id = user.id
             print(f"\nFetching {tweet_type} for user: {screen_name} (ID: {user_id})")
             
-            total_tweets = 0
-            page = 1
-            current_tweets = None
+            result = await self.paginate_tweets(
+                job_id,
+                lambda: self.client.get_user_tweets(user_id, tweet_type),
+                target_count,
+                tweet_type,
+                self.rate_budgets.get(USER_TIMELINE_ENDPOINTS.get(tweet_type, 'UserTweets'))
+            )
+
+            # Update job status
+            status = 'FAILED' if 'error' in result else 'COMPLETED'
+            self.update_job_status(job_id, status, result['tweet_count'], result)
+            print(f"\nFinal tweet count: {result['tweet_count']}")
+            return result
+                
+        except Exception as e:
+            print(f"Error fetching user tweets: {e}")
+            self.update_job_status(job_id, 'FAILED', result={"error": str(e)})
+            return {"tweet_count": 0, "duplicate_count": 0, "error": str(e)}
+
+    async def resolve_users(self, screen_names: List[str], concurrency: int) -> Dict:
+        """
+        Resolve screen names to users concurrently under the UserByScreenName budget
+        
+        Returns:
+            Dict mapping each screen name to its user, or to the exception raised
+        """
+        budget = self.rate_budgets.get('UserByScreenName')
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resolve(screen_name):
+            async with semaphore:
+                await budget.acquire()
+                try:
+                    user = await self.client.get_user_by_screen_name(screen_name)
+                    return user if user else LookupError(f"User not found: {screen_name}")
+                except Exception as e:
+                    return e
+
+        users = await asyncio.gather(*(resolve(screen_name) for screen_name in screen_names))
+        return dict(zip(screen_names, users))
+
+    async def search_multi_user_tweets(self, job_id: int, screen_names: List[str], tweet_type: str = 'Tweets',
+                                       target_count: int = 30, concurrency: int = 5,
+                                       batch_size: int = MULTI_USER_BATCH_SIZE) -> Dict:
+        """
+        Fetch tweets from many users, crawling their timelines concurrently
+        
+        Args:
+            job_id: The ID of the scraping job
+            screen_names: Twitter screen names (usernames)
+            tweet_type: Type of tweets to retrieve ('Tweets', 'Replies', 'Media', 'Likes')
+            target_count: Target number of tweets to fetch per user
+            concurrency: Maximum number of timelines crawled at the same time
+            batch_size: Number of tweets from completed timelines written per batch
+        """
+        try:
+            # Normalize and de-duplicate the list, keeping its order
+            screen_names = list(dict.fromkeys(name.strip().lstrip('@') for name in screen_names if name.strip()))
+            print(f"\nResolving {len(screen_names)} users")
+            users = await self.resolve_users(screen_names, concurrency)
+
+            result = {"tweet_count": 0, "duplicate_count": 0, "skipped_count": 0, "pages": 0,
+                      "users": {}, "failures": {}}
+            seen_ids = SeenIds(target_count * len(screen_names))
+            budget = self.rate_budgets.get(USER_TIMELINE_ENDPOINTS.get(tweet_type, 'UserTweets'))
+            semaphore = asyncio.Semaphore(concurrency)
+            loop = asyncio.get_running_loop()
+            pending = []
+            pending_counts = {}
+            write_lock = asyncio.Lock()
+
+            async def flush():
+                """Write the pending timelines in one batch and credit their users"""
+                if not pending:
+                    return
+                records = pending[:]
+                counts = dict(pending_counts)
+                pending.clear()
+                pending_counts.clear()
+                # Run the blocking database write off the event loop
+                saved = await loop.run_in_executor(None, self.save_tweets, job_id, records)
+                if saved == len(records):
+                    for screen_name, count in counts.items():
+                        result['users'][screen_name] = count
+                    result['tweet_count'] += saved
+                else:
+                    for screen_name in counts:
+                        result['failures'][screen_name] = "Failed to save tweets"
+                await loop.run_in_executor(None, self.update_job_progress, job_id, result['tweet_count'])
+
+            async def crawl(screen_name, user):
+                async with semaphore:
+                    try:
+                        timeline = []
+                        async for records in self.iterate_unique_pages(
+                            lambda: self.client.get_user_tweets(user.id, tweet_type),
+                            target_count,
+                            f"{tweet_type} for {screen_name}",
+                            seen_ids,
+                            result,
+                            budget
+                        ):
+                            timeline.extend(records)
+                    except Exception as e:
+                        print(f"Error fetching tweets for {screen_name}: {e}")
+                        result['failures'][screen_name] = str(e)
+                        return
+
+                # Completed timelines join the shared batch, written once it is full
+                async with write_lock:
+                    pending.extend(timeline)
+                    pending_counts[screen_name] = len(timeline)
+                    if len(pending) >= batch_size:
+                        await flush()
 
-            while total_tweets < target_count:
-                if page == 1:
-                    # Get initial page of tweets
-                    current_tweets = await self.client.get_user_tweets(user_id, tweet_type)
-                    print(f"\nFetching initial page of {tweet_type}")
+            crawls = []
+            for screen_name, user in users.items():
+                if isinstance(user, Exception):
+                    result['failures'][screen_name] = str(user)
                 else:
-                    print(f"\nFetching page {page} of {tweet_type}...")
-                    current_tweets = await current_tweets.next()
+                    crawls.append(crawl(screen_name, user))
+
+            await asyncio.gather(*crawls)
+            async with write_lock:
+                await flush()
+
+            # Update job status
+            status = 'COMPLETED' if result['users'] or not screen_names else 'FAILED'
+            self.update_job_status(job_id, status, result['tweet_count'], result)
+            print(f"\nFinal tweet count: {result['tweet_count']} from {len(result['users'])} users, "
+                  f"{len(result['failures'])} failed")
+            return result
+
+        except Exception as e:
+            print(f"Error fetching multi-user tweets: {e}")
+            self.update_job_status(job_id, 'FAILED', result={"error": str(e)})
+            return {"tweet_count": 0, "duplicate_count": 0, "error": str(e)}
+
+    def get_thread_seeds(self, source_job_id: int, limit: int) -> List[str]:
+        """Get the ids of a job's tweets that have replies, most replied first"""
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return []
                 
-                if not current_tweets:
-                    print("No more tweets available")
-                    break
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT id FROM tweets
+                WHERE job_id = %s AND reply_count > 0
+                ORDER BY reply_count DESC
+                LIMIT %s
+            """, (source_job_id, limit))
+            return [row[0] for row in cursor.fetchall()]
+            
+        except Error as e:
+            print(f"Error loading thread seeds: {e}")
+            return []
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def save_thread_batch(self, job_id: int, records: List[TweetRecord], relations: List[tuple]) -> Optional[int]:
+        """Save reply tweets and their parent/child relations in one transaction, None on failure"""
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return None
+                
+            cursor = connection.cursor()
+            
+            tweets_saved = insert_tweet_records(cursor, job_id, records)
+            if relations:
+                cursor.executemany("""
+                    INSERT INTO tweet_relations (child_id, parent_id, root_id, depth, job_id)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                    parent_id = VALUES(parent_id),
+                    root_id = VALUES(root_id),
+                    depth = VALUES(depth),
+                    job_id = VALUES(job_id)
+                """, relations)
+                
+            batch_id = publish_batch(job_id, records)
+            connection.commit()
+            commit_batch(batch_id)
+            print(f"Saved {tweets_saved} tweets and {len(relations)} relations to database")
+            return tweets_saved
+            
+        except (Error, OSError) as e:
+            print(f"Error saving thread batch: {e}")
+            return None
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def get_metrics_refresh_candidates(self, limit: int, max_age_days: int, min_interval_minutes: int,
+                                       source_job_id: int = None) -> List[str]:
+        """
+        Get the ids of stored tweets most worth re-checking, best first
 
-                # Calculate how many tweets we can use without exceeding target
-                remaining = target_count - total_tweets
-                tweets_to_use = current_tweets[:remaining]
+        Tweets are ranked by engagement per hour of age with a decay, so recent
+        and fast-moving tweets come first. Tweets checked within the last
+        min_interval_minutes are skipped.
+        """
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return []
                 
-                # Save tweets to database
-                saved_count = self.save_tweets(job_id, tweets_to_use)
-                total_tweets += saved_count
+            cursor = connection.cursor()
+            
+            # created_at is stored in UTC, the check timestamps in server time
+            query = """
+                SELECT id FROM tweets
+                WHERE created_at >= UTC_TIMESTAMP() - INTERVAL %s DAY
+                AND COALESCE(metrics_checked_at, indexed_at) < NOW() - INTERVAL %s MINUTE
+            """
+            values = [max_age_days, min_interval_minutes]
+            if source_job_id:
+                query += " AND job_id = %s"
+                values.append(source_job_id)
+            query += """
+                ORDER BY (reply_count + retweet_count + bookmark_count + 1)
+                         / POW(GREATEST(TIMESTAMPDIFF(MINUTE, created_at, UTC_TIMESTAMP()), 0) / 60 + 2, 1.5) DESC
+                LIMIT %s
+            """
+            values.append(limit)
+            
+            cursor.execute(query, tuple(values))
+            return [row[0] for row in cursor.fetchall()]
+            
+        except Error as e:
+            print(f"Error loading metrics refresh candidates: {e}")
+            return []
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    def save_metrics_refresh(self, tweet_ids: List[str], observed: Dict[str, TweetRecord]) -> Dict:
+        """
+        Store refreshed engagement counts for one lookup batch
+
+        Only tweets whose counts changed get history rows. Every checked tweet
+        gets a new metrics_checked_at, including ones the lookup no longer
+        returns (deleted or protected), so they are not retried straight away.
+        """
+        try:
+            connection = self.connect_to_db()
+            if connection is None:
+                return {"checked": 0, "changed": 0, "missing": 0}
                 
-                print(f"\nTotal tweets fetched so far: {total_tweets}")
+            cursor = connection.cursor()
+            
+            # Lock the rows so a concurrent save cannot slip between read and write
+            placeholders = ', '.join(['%s'] * len(tweet_ids))
+            cursor.execute(f"""
+                SELECT id, created_at, reply_count, retweet_count, bookmark_count,
+                       COALESCE(metrics_checked_at, indexed_at), job_id
+                FROM tweets
+                WHERE id IN ({placeholders})
+                FOR UPDATE
+            """, tuple(tweet_ids))
+            stored = cursor.fetchall()
+            
+            previous = {row[0]: (row[2], row[3], row[4], row[5]) for row in stored}
+            records = [record for tweet_id, record in observed.items() if tweet_id in previous]
+            changed = record_metric_changes(cursor, previous, records)
+            
+            # created_at is part of the key on partitioned tables and prunes the update
+            created_at = {row[0]: row[1] for row in stored}
+            if records:
+                cursor.executemany("""
+                    UPDATE tweets
+                    SET reply_count = %s, retweet_count = %s, bookmark_count = %s, metrics_checked_at = NOW()
+                    WHERE id = %s AND created_at = %s
+                """, [(record.reply_count, record.retweet_count, record.bookmark_count,
+                       record.id, created_at[record.id]) for record in records])
+            
+            missing = [tweet_id for tweet_id in previous if tweet_id not in observed]
+            if missing:
+                cursor.executemany("""
+                    UPDATE tweets SET metrics_checked_at = NOW() WHERE id = %s AND created_at = %s
+                """, [(tweet_id, created_at[tweet_id]) for tweet_id in missing])
+            
+            # The tweets belong to other jobs, whose cached responses are versioned by updated_at
+            job_ids = sorted({row[6] for row in stored if row[6] is not None})
+            if job_ids:
+                placeholders = ', '.join(['%s'] * len(job_ids))
+                cursor.execute(f"""
+                    UPDATE scraping_jobs SET updated_at = NOW(6) WHERE job_id IN ({placeholders})
+                """, tuple(job_ids))
                 
-                if total_tweets >= target_count:
-                    print(f"\nReached target count of {target_count} tweets")
-                    break
+            connection.commit()
+            return {"checked": len(previous), "changed": changed, "missing": len(missing)}
+            
+        except Error as e:
+            print(f"Error saving metrics refresh: {e}")
+            return {"checked": 0, "changed": 0, "missing": 0}
+        finally:
+            if 'connection' in locals() and connection.is_connected():
+                cursor.close()
+                connection.close()
+
+    async def refresh_metrics(self, job_id: int, source_job_id: int = None, target_count: int = 1000,
+                              max_age_days: int = 7, min_interval_minutes: int = 60,
+                              batch_size: int = METRICS_BATCH_SIZE) -> Dict:
+        """
+        Re-fetch engagement counts of stored tweets in batched lookups by id
+        
+        Args:
+            job_id: The ID of the scraping job
+            source_job_id: Only refresh tweets of this job
+            target_count: Maximum number of tweets to check
+            max_age_days: Only refresh tweets created within this many days
+            min_interval_minutes: Skip tweets checked more recently than this
+            batch_size: Tweet ids per lookup request
+        """
+        try:
+            tweet_ids = self.get_metrics_refresh_candidates(target_count, max_age_days,
+                                                            min_interval_minutes, source_job_id)
+            print(f"\nRefreshing metrics for {len(tweet_ids)} tweets")
+            
+            budget = self.rate_budgets.get('TweetResultsByRestIds')
+            stats = {"checked": 0, "changed": 0, "missing": 0}
+            for start in range(0, len(tweet_ids), batch_size):
+                batch = tweet_ids[start:start + batch_size]
+                await budget.acquire()
+                tweets = await self.client.get_tweets_by_ids(batch)
+                # Unavailable tweets come back as None
+                observed = {str(tweet.id): TweetRecord.from_tweet(tweet) for tweet in tweets if tweet is not None}
+                
+                saved = self.save_metrics_refresh(batch, observed)
+                for key in stats:
+                    stats[key] += saved[key]
+                self.update_job_progress(job_id, stats['checked'])
+                print(f"Checked {stats['checked']} tweets, {stats['changed']} changed")
+            
+            result = {
+                "tweet_count": stats['checked'],
+                "duplicate_count": 0,
+                "changed_count": stats['changed'],
+                "missing_count": stats['missing']
+            }
+            self.update_job_status(job_id, 'COMPLETED', stats['checked'], result)
+            return result
                 
-                page += 1
+        except Exception as e:
+            print(f"Error refreshing metrics: {e}")
+            self.update_job_status(job_id, 'FAILED', result={"error": str(e)})
+            return {"tweet_count": 0, "duplicate_count": 0, "error": str(e)}
 
-            # Update job status
-            self.update_job_status(job_id, 'COMPLETED', total_tweets)
-            print(f"\nFinal tweet count: {total_tweets}")
-            return total_tweets
+    async def expand_threads(self, job_id: int, root_ids: List[str], save_roots: bool = True,
+                             max_depth: int = 3, max_replies: int = 50, max_tweets: int = 1000,
+                             concurrency: int = 3, batch_size: int = THREAD_BATCH_SIZE) -> Dict:
+        """
+        Crawl the reply trees under the given tweets breadth-first
+        
+        Args:
+            job_id: The ID of the scraping job
+            root_ids: Ids of the tweets whose conversations are expanded
+            save_roots: Whether to save the root tweets themselves (False when they
+                        already belong to another job)
+            max_depth: Maximum reply depth below a root
+            max_replies: Maximum replies fetched under any single tweet
+            max_tweets: Maximum reply tweets saved by the whole job
+            concurrency: Maximum number of tweets expanded at the same time
+            batch_size: Number of tweets written per batch
+        """
+        try:
+            result = {"tweet_count": 0, "duplicate_count": 0, "skipped_count": 0, "roots": 0,
+                      "depth_reached": 0, "failures": {}}
+            # Partitioned tables cannot store tweets without created_at
+            require_created_at = tweets_partitioned()
+            # Recorded depth of every tweet in the trees, so a reply's depth follows its parent
+            depths = {}
+            seen_ids = SeenIds(max_tweets + len(root_ids))
+            budget = self.rate_budgets.get('TweetDetail')
+            loop = asyncio.get_running_loop()
+            frontier = asyncio.Queue()
+            pending_records = []
+            pending_relations = []
+            collected = 0
+            # Concurrent batch transactions would lock rollup rows in different orders
+            write_lock = asyncio.Lock()
+
+            async def flush():
+                """Write the pending replies and relations in one batch"""
+                if not pending_relations:
+                    return
+                records = pending_records[:]
+                relations = pending_relations[:]
+                pending_records.clear()
+                pending_relations.clear()
+                # Run the blocking database write off the event loop
+                saved = await loop.run_in_executor(None, self.save_thread_batch, job_id, records, relations)
+                if saved == len(records):
+                    result['tweet_count'] += saved
+                else:
+                    # The ids are already marked as seen, so report the loss per conversation
+                    for root_id in dict.fromkeys(relation[2] for relation in relations):
+                        result['failures'][root_id] = "Failed to save thread batch"
+                await loop.run_in_executor(None, self.update_job_progress, job_id, result['tweet_count'])
+
+            async def expand(tweet_id, root_id, depth):
+                """Fetch the replies under one tweet and queue those that have replies of their own"""
+                nonlocal collected
+                await budget.acquire()
+                tweet = await self.client.get_tweet_by_id(tweet_id)
                 
+                if depth == 0:
+                    # The root is stored as depth 0 so a conversation reads back in one query
+                    result['roots'] += 1
+                    if save_roots:
+                        record = TweetRecord.from_tweet(tweet)
+                        if require_created_at and record.created_at is None:
+                            result['skipped_count'] += 1
+                        else:
+                            pending_records.append(record)
+                    pending_relations.append((tweet_id, None, root_id, 0, job_id))
+
+                replies = tweet.replies
+                taken = 0
+                while replies and taken < max_replies and collected < max_tweets:
+                    new_on_page = 0
+                    for reply in replies:
+                        if taken >= max_replies or collected >= max_tweets:
+                            break
+                        if not seen_ids.add(reply.id):
+                            result['duplicate_count'] += 1
+                            continue
+                        new_on_page += 1
+                        record = TweetRecord.from_tweet(reply)
+                        if require_created_at and record.created_at is None:
+                            result['skipped_count'] += 1
+                            continue
+                        taken += 1
+                        collected += 1
+                        # Self-reply chains carry their own parent, deeper than this tweet;
+                        # a parent we have not recorded leaves the reply under this tweet
+                        parent_id = getattr(reply, 'in_reply_to', None)
+                        if parent_id not in depths:
+                            parent_id = tweet_id
+                        reply_depth = depths[parent_id] + 1
+                        depths[reply.id] = reply_depth
+                        pending_records.append(record)
+                        pending_relations.append((reply.id, parent_id, root_id, reply_depth, job_id))
+                        result['depth_reached'] = max(result['depth_reached'], reply_depth)
+                        
+                        # Leaves are not fetched, reply_count tells us there is nothing below
+                        if reply_depth < max_depth and getattr(reply, 'reply_count', 0):
+                            frontier.put_nowait((reply.id, root_id, reply_depth))
+                    
+                    if len(pending_relations) >= batch_size:
+                        async with write_lock:
+                            await flush()
+                    if not new_on_page or taken >= max_replies or collected >= max_tweets:
+                        break
+                    await budget.acquire()
+                    replies = await replies.next()
+
+            async def worker():
+                while True:
+                    tweet_id, root_id, depth = await frontier.get()
+                    try:
+                        # Once the tweet budget is spent the rest of the frontier is drained
+                        if collected < max_tweets:
+                            await expand(tweet_id, root_id, depth)
+                    except Exception as e:
+                        print(f"Error expanding tweet {tweet_id}: {e}")
+                        result['failures'][tweet_id] = str(e)
+                    finally:
+                        frontier.task_done()
+
+            for root_id in dict.fromkeys(str(tweet_id) for tweet_id in root_ids):
+                seen_ids.add(root_id)
+                depths[root_id] = 0
+                frontier.put_nowait((root_id, root_id, 0))
+
+            print(f"\nExpanding conversations under {frontier.qsize()} tweets")
+            workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+            await frontier.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            async with write_lock:
+                await flush()
+
+            # Update job status
+            status = 'COMPLETED' if result['roots'] or not root_ids else 'FAILED'
+            self.update_job_status(job_id, status, result['tweet_count'], result)
+            print(f"\nFinal tweet count: {result['tweet_count']} across {result['roots']} conversations")
+            return result
+
         except Exception as e:
-            print(f"Error fetching user tweets: {e}")
-            self.update_job_status(job_id, 'FAILED')
-            return 0
+            print(f"Error expanding threads: {e}")
+            self.update_job_status(job_id, 'FAILED', result={"error": str(e)})
+            return {"tweet_count": 0, "duplicate_count": 0, "error": str(e)}
 
 # Example of how to use this service (not executed by importing the module)
 async def example_usage():
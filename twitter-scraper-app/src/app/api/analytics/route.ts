@@ -0,0 +1,33 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { executeDbQuery } from '@/utils/dbQuery';
+
+// GET handler to retrieve rollup analytics for a job or a query
+export async function GET(request: NextRequest) {
+  try {
+    const { searchParams } = new URL(request.url);
+    const jobId = searchParams.get('jobId');
+    const query = searchParams.get('query');
+    const limit = searchParams.get('limit') || '10';
+
+    if (jobId) {
+      const analytics = await executeDbQuery('get_job_analytics', { jobId, limit });
+      return NextResponse.json(analytics);
+    }
+
+    if (query) {
+      const analytics = await executeDbQuery('get_query_analytics', { query, limit });
+      return NextResponse.json(analytics);
+    }
+
+    return NextResponse.json(
+      { error: 'Either jobId or query is required' },
+      { status: 400 }
+    );
+  } catch (error: any) {
+    console.error('Error fetching analytics:', error);
+    return NextResponse.json(
+      { error: 'Failed to fetch analytics', details: error.message },
+      { status: 500 }
+    );
+  }
+}
@@ -0,0 +1,26 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { executeDbQuery } from '@/utils/dbQuery';
+
+// GET handler to retrieve an expanded conversation from any tweet in it
+export async function GET(request: NextRequest) {
+  try {
+    const { searchParams } = new URL(request.url);
+    const tweetId = searchParams.get('tweetId');
+
+    if (!tweetId) {
+      return NextResponse.json(
+        { error: 'Tweet ID is required' },
+        { status: 400 }
+      );
+    }
+
+    const conversation = await executeDbQuery('get_conversation', { tweetId });
+    return NextResponse.json(conversation);
+  } catch (error: any) {
+    console.error('Error fetching conversation:', error);
+    return NextResponse.json(
+      { error: 'Failed to fetch conversation', details: error.message },
+      { status: 500 }
+    );
+  }
+}
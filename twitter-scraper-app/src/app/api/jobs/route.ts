@@ -1,63 +1,21 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { spawn } from 'child_process';
-import path from 'path';
-import fs from 'fs';
-
-// The function to execute the Python DB query
-async function executeDbQuery(operation: string, params: any = {}): Promise<any> {
-  return new Promise((resolve, reject) => {
-    // Path to the Python DB interface script
-    let scriptPath = path.resolve(process.cwd(), '..', 'db_interface.py');
-    
-    // Make sure the script exists
-    if (!fs.existsSync(scriptPath)) {
-      reject(new Error(`DB interface script not found at ${scriptPath}`));
-      return;
-    }
-
-    // Serialize parameters to pass to Python
-    const serializedParams = JSON.stringify(params);
-    
-    // Spawn the Python process
-    const pythonProcess = spawn('python', [
-      scriptPath,
-      operation,
-      serializedParams
-    ]);
-
-    // Collect data from script
-    let scriptOutput = '';
-    let scriptError = '';
-
-    // Collect data from standard output
-    pythonProcess.stdout.on('data', (data) => {
-      scriptOutput += data.toString();
-    });
-
-    // Collect data from standard error
-    pythonProcess.stderr.on('data', (data) => {
-      scriptError += data.toString();
-    });
+import { executeDbQuery, fetchFromDbService, isDbServiceEnabled } from '@/utils/dbQuery';
+
+// Relay a read service response, keeping its ETag so browsers can revalidate
+async function relayServiceResponse(servicePath: string, request: NextRequest) {
+  const response = await fetchFromDbService(servicePath, request.headers.get('if-none-match'));
+  const etag = response.headers.get('etag');
+  const headers: Record<string, string> = { 'Cache-Control': 'no-cache' };
+  if (etag) {
+    headers['ETag'] = etag;
+  }
 
-    // Handle process completion
-    pythonProcess.on('close', (code) => {
-      if (code !== 0) {
-        console.error(`Python script exited with code ${code}`);
-        console.error(`Error: ${scriptError}`);
-        reject(new Error(`Script execution failed: ${scriptError}`));
-        return;
-      }
+  // Unchanged since the browser's copy, nothing was read from MySQL
+  if (response.status === 304) {
+    return new NextResponse(null, { status: 304, headers });
+  }
 
-      try {
-        // Try to parse the output as JSON
-        const result = JSON.parse(scriptOutput);
-        resolve(result);
-      } catch (error) {
-        console.error('Failed to parse script output as JSON:', scriptOutput);
-        reject(new Error('Failed to parse script output as JSON'));
-      }
-    });
-  });
+  return NextResponse.json(await response.json(), { status: response.status, headers });
 }
 
 // GET handler to retrieve jobs
@@ -66,6 +24,12 @@ export async function GET(request: NextRequest) {
     const { searchParams } = new URL(request.url);
     const jobId = searchParams.get('jobId');
     
+    // Prefer the persistent read service, which answers conditional GETs from its cache
+    if (isDbServiceEnabled()) {
+      const servicePath = jobId ? `/jobs/${encodeURIComponent(jobId)}` : '/jobs';
+      return relayServiceResponse(servicePath, request);
+    }
+    
     // If jobId is provided, get that specific job with its tweets
     if (jobId) {
       const jobDetails = await executeDbQuery('get_job_with_tweets', { jobId });
@@ -82,4 +46,4 @@ export async function GET(request: NextRequest) {
       { status: 500 }
     );
   }
-} 
\ No newline at end of file
+}
@@ -0,0 +1,53 @@
+import { NextRequest } from 'next/server';
+import { subscribeToJobProgress } from '@/utils/jobProgress';
+
+export const dynamic = 'force-dynamic';
+
+// GET handler that streams job progress as Server-Sent Events
+export async function GET(request: NextRequest) {
+  const { searchParams } = new URL(request.url);
+  const jobId = searchParams.get('jobId');
+
+  // Jobs we keep reporting on until they finish
+  const trackedJobs = new Set<number>();
+  if (jobId) {
+    trackedJobs.add(parseInt(jobId));
+  }
+
+  const encoder = new TextEncoder();
+  let unsubscribe: (() => void) | null = null;
+  let closed = false;
+
+  const close = () => {
+    closed = true;
+    if (unsubscribe) unsubscribe();
+  };
+
+  const stream = new ReadableStream({
+    start(controller) {
+      // Progress comes from the poller shared by every open stream
+      unsubscribe = subscribeToJobProgress({
+        trackedJobs,
+        lastSeen: new Map<number, string>(),
+        send: (event: string, data: any) => {
+          if (closed) return;
+          controller.enqueue(encoder.encode(`event: ${event}\ndata: ${JSON.stringify(data)}\n\n`));
+        }
+      });
+    },
+    cancel() {
+      close();
+    }
+  });
+
+  // Unsubscribe when the browser disconnects
+  request.signal.addEventListener('abort', close);
+
+  return new Response(stream, {
+    headers: {
+      'Content-Type': 'text/event-stream',
+      'Cache-Control': 'no-cache, no-transform',
+      'Connection': 'keep-alive'
+    }
+  });
+}
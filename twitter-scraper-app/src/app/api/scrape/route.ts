@@ -3,6 +3,7 @@ import { spawn } from 'child_process';
 import path from 'path';
 import fs from 'fs';
 import { getRateLimitInfo } from '@/utils/rateLimits';
+import { wakeJobProgress } from '@/utils/jobProgress';
 
 // Define scrape types
 const SCRAPE_TYPES = {
@@ -10,10 +11,14 @@ const SCRAPE_TYPES = {
   HASHTAG_TOP: 'HASHTAG_TOP_TWEETS',
   HASHTAG_LATEST: 'HASHTAG_LATEST_TWEETS',
   USER: 'USER_TWEETS',
+  MULTI_USER: 'MULTI_USER_TWEETS',
+  THREAD_EXPANSION: 'THREAD_EXPANSION',
+  METRICS_REFRESH: 'METRICS_REFRESH',
   DATE_RANGE: 'DATE_RANGE_TWEETS',
 };
 
-// The function to execute the Python scraper
+// The function to start the Python scraper. It resolves as soon as the script
+// announces the job ID and leaves the scrape running in the background.
 async function executeScraper(jobType: string, params: any): Promise<any> {
   return new Promise((resolve, reject) => {
     // Create a command to execute the appropriate Python function based on job type
@@ -28,20 +33,40 @@ async function executeScraper(jobType: string, params: any): Promise<any> {
     // Serialize parameters to pass to Python
     const serializedParams = JSON.stringify(params);
     
-    // Spawn the Python process
+    // Spawn the Python process detached so it outlives this request
     const pythonProcess = spawn('python', [
       scriptPath,
       jobType,
       serializedParams
-    ]);
+    ], { detached: true });
+    pythonProcess.unref();
 
     // Collect data from script
-    let scriptOutput = '';
+    let pendingOutput = '';
     let scriptError = '';
+    let settled = false;
 
-    // Collect data from standard output
+    // Look for the first JSON line carrying a job ID or an error
+    const handleLine = (line: string) => {
+      const trimmed = line.trim();
+      if (settled || !trimmed.startsWith('{')) return;
+      try {
+        const message = JSON.parse(trimmed);
+        if (message.jobId || message.error) {
+          settled = true;
+          resolve(message);
+        }
+      } catch (error) {
+        // Not a JSON line, just log output from the scraper
+      }
+    };
+
+    // Only the job ID handshake arrives here, later output goes to logs/job_<id>.log
     pythonProcess.stdout.on('data', (data) => {
-      scriptOutput += data.toString();
+      pendingOutput += data.toString();
+      const lines = pendingOutput.split('\n');
+      pendingOutput = lines.pop() || '';
+      lines.forEach(handleLine);
     });
 
     // Collect data from standard error
@@ -51,6 +76,14 @@ async function executeScraper(jobType: string, params: any): Promise<any> {
 
     // Handle process completion
     pythonProcess.on('close', (code) => {
+      handleLine(pendingOutput);
+      if (settled) {
+        if (code !== 0) {
+          console.error(`Python scraper exited with code ${code}: ${scriptError}`);
+        }
+        return;
+      }
+
       if (code !== 0) {
         console.error(`Python script exited with code ${code}`);
         console.error(`Error: ${scriptError}`);
@@ -58,14 +91,7 @@ async function executeScraper(jobType: string, params: any): Promise<any> {
         return;
       }
 
-      try {
-        // Try to parse the output as JSON
-        const result = JSON.parse(scriptOutput);
-        resolve(result);
-      } catch (error) {
-        console.error('Failed to parse script output as JSON:', scriptOutput);
-        reject(new Error('Failed to parse script output as JSON'));
-      }
+      reject(new Error('Scraper exited without reporting a job ID'));
     });
   });
 }
@@ -101,6 +127,15 @@ export async function POST(request: NextRequest) {
       case SCRAPE_TYPES.USER:
         result = await executeScraper(SCRAPE_TYPES.USER, params);
         break;
+      case SCRAPE_TYPES.MULTI_USER:
+        result = await executeScraper(SCRAPE_TYPES.MULTI_USER, params);
+        break;
+      case SCRAPE_TYPES.THREAD_EXPANSION:
+        result = await executeScraper(SCRAPE_TYPES.THREAD_EXPANSION, params);
+        break;
+      case SCRAPE_TYPES.METRICS_REFRESH:
+        result = await executeScraper(SCRAPE_TYPES.METRICS_REFRESH, params);
+        break;
       case SCRAPE_TYPES.DATE_RANGE:
         result = await executeScraper(SCRAPE_TYPES.DATE_RANGE, params);
         break;
@@ -111,6 +146,9 @@ export async function POST(request: NextRequest) {
         );
     }
 
+    // Let open progress streams pick up the new job without waiting out a back-off
+    wakeJobProgress();
+
     // Include rate limit info in the response
     const response = NextResponse.json({ 
       success: true, 
@@ -25,9 +25,26 @@ type Job = {
   end_time: string | null;
   status: string;
   tweet_count: number;
+  last_page_at: string | null;
+  result: JobResult | null;
   created_at: string;
 };
 
+type JobResult = {
+  tweet_count?: number;
+  duplicate_count?: number;
+  pages?: number;
+  error?: string;
+};
+
+type JobProgress = {
+  job_id: number;
+  status: string;
+  tweet_count: number;
+  last_page_at: string | null;
+  end_time: string | null;
+};
+
 export default function JobsPage() {
   const searchParams = useSearchParams();
   const jobId = searchParams.get('jobId');
@@ -74,6 +91,35 @@ export default function JobsPage() {
     fetchData();
   }, [jobId]);
 
+  // Subscribe to live progress updates instead of re-fetching the job list
+  useEffect(() => {
+    const streamUrl = jobId ? `/api/jobs/stream?jobId=${jobId}` : '/api/jobs/stream';
+    const source = new EventSource(streamUrl);
+
+    source.addEventListener('progress', (event) => {
+      const progress: JobProgress = JSON.parse((event as MessageEvent).data);
+
+      setJobs(prev => {
+        if (!prev.some(job => job.job_id === progress.job_id)) {
+          // A job started after the list was loaded, fetch the full row once
+          if (!jobId) {
+            axios.get('/api/jobs').then(response => {
+              if (response.data.success) {
+                setJobs(response.data.jobs);
+              }
+            }).catch(() => {});
+          }
+          return prev;
+        }
+        return prev.map(job => job.job_id === progress.job_id ? { ...job, ...progress } : job);
+      });
+
+      setSelectedJob(prev => prev && prev.job_id === progress.job_id ? { ...prev, ...progress } : prev);
+    });
+
+    return () => source.close();
+  }, [jobId]);
+
   // Handle job selection
   const handleJobSelect = async (job: Job) => {
     setLoading(true);
@@ -109,6 +155,8 @@ export default function JobsPage() {
   // Get status color
   const getStatusColor = (status: string) => {
     switch (status.toUpperCase()) {
+      case 'PENDING':
+        return 'bg-blue-100 text-blue-800';
       case 'RUNNING':
         return 'bg-yellow-100 text-yellow-800';
       case 'COMPLETED':
@@ -257,6 +305,22 @@ export default function JobsPage() {
                     <h3 className="text-sm font-medium text-black">Tweet Count</h3>
                     <p className="mt-1 text-black">{selectedJob.tweet_count}</p>
                   </div>
+                  {selectedJob.result?.duplicate_count !== undefined && (
+                    <div>
+                      <h3 className="text-sm font-medium text-black">Duplicates Dropped</h3>
+                      <p className="mt-1 text-black">{selectedJob.result.duplicate_count}</p>
+                    </div>
+                  )}
+                  {selectedJob.result?.error && (
+                    <div>
+                      <h3 className="text-sm font-medium text-black">Error</h3>
+                      <p className="mt-1 text-red-700">{selectedJob.result.error}</p>
+                    </div>
+                  )}
+                  <div>
+                    <h3 className="text-sm font-medium text-black">Last Page Saved</h3>
+                    <p className="mt-1 text-black">{selectedJob.last_page_at ? formatDate(selectedJob.last_page_at) : 'No pages saved yet'}</p>
+                  </div>
                 </div>
                 
                 {loading ? (
@@ -60,7 +60,7 @@ export default function SearchPage() {
         recordApiRequest(response.data.rateLimitInfo.endpoint);
       }
 
-      setSuccess(`Successfully scraped ${response.data.result.tweetCount} tweets!`);
+      setSuccess(`Scraping job #${response.data.result.jobId} started! Follow its progress on the jobs page.`);
       
       // Navigate to the job details page
       setTimeout(() => {
@@ -63,13 +63,24 @@ export default function UserPage() {
     setSuccess(null);
 
     try {
-      // Remove @ symbol if present
-      const cleanUsername = formData.username.replace(/^@/, '');
+      // Remove @ symbols and split a comma or space separated list
+      const usernames = formData.username
+        .split(/[\s,]+/)
+        .map(name => name.replace(/^@/, ''))
+        .filter(name => name.length > 0);
       
-      const response = await axios.post('/api/scrape', {
+      // Several usernames are crawled concurrently as one multi-user job
+      const response = await axios.post('/api/scrape', usernames.length > 1 ? {
+        type: 'MULTI_USER_TWEETS',
+        params: {
+          usernames,
+          tweetType: formData.tweetType,
+          count: parseInt(formData.count.toString())
+        }
+      } : {
         type: 'USER_TWEETS',
         params: {
-          username: cleanUsername,
+          username: usernames[0] || '',
           tweetType: formData.tweetType,
           count: parseInt(formData.count.toString())
         }
@@ -80,7 +91,7 @@ export default function UserPage() {
         recordApiRequest(response.data.rateLimitInfo.endpoint);
       }
 
-      setSuccess(`Successfully scraped ${response.data.result.tweetCount} tweets!`);
+      setSuccess(`Scraping job #${response.data.result.jobId} started! Follow its progress on the jobs page.`);
       
       // Navigate to the job details page
       setTimeout(() => {
@@ -138,6 +149,9 @@ export default function UserPage() {
                 disabled={isRateLimitExhausted}
               />
             </div>
+            <p className="mt-1 text-sm text-black">
+              Separate several usernames with commas to crawl their timelines concurrently; the tweet count applies per user.
+            </p>
           </div>
           
           <div className="mb-4">
@@ -0,0 +1,103 @@
+import { spawn } from 'child_process';
+import path from 'path';
+import fs from 'fs';
+
+// Base URL of the persistent read service started with `python db_interface.py serve`.
+// When unset every query spawns db_interface.py instead.
+const DB_SERVICE_URL = process.env.DB_SERVICE_URL;
+
+export function isDbServiceEnabled(): boolean {
+  return !!DB_SERVICE_URL;
+}
+
+// Map a db_interface operation to its path on the read service
+function getServicePath(operation: string, params: any): string | null {
+  switch (operation) {
+    case 'get_all_jobs':
+      return '/jobs';
+    case 'get_job_with_tweets':
+      return `/jobs/${encodeURIComponent(params.jobId)}`;
+    case 'get_job_analytics':
+      return `/jobs/${encodeURIComponent(params.jobId)}/analytics`;
+    case 'get_query_analytics':
+      return `/analytics?query=${encodeURIComponent(params.query)}&limit=${encodeURIComponent(params.limit || 10)}`;
+    case 'get_conversation':
+      return `/conversations/${encodeURIComponent(params.tweetId)}`;
+    case 'get_job_progress':
+      return `/jobs/progress?jobIds=${(params.jobIds || []).join(',')}`;
+    default:
+      return null;
+  }
+}
+
+// Fetch from the read service, forwarding an ETag for conditional requests
+export async function fetchFromDbService(servicePath: string, ifNoneMatch?: string | null): Promise<Response> {
+  const headers: Record<string, string> = {};
+  if (ifNoneMatch) {
+    headers['If-None-Match'] = ifNoneMatch;
+  }
+  return fetch(`${DB_SERVICE_URL}${servicePath}`, { headers, cache: 'no-store' });
+}
+
+// The function to execute the Python DB query
+export async function executeDbQuery(operation: string, params: any = {}): Promise<any> {
+  const servicePath = DB_SERVICE_URL ? getServicePath(operation, params) : null;
+  if (servicePath) {
+    const response = await fetchFromDbService(servicePath);
+    return response.json();
+  }
+
+  return new Promise((resolve, reject) => {
+    // Path to the Python DB interface script
+    let scriptPath = path.resolve(process.cwd(), '..', 'db_interface.py');
+    
+    // Make sure the script exists
+    if (!fs.existsSync(scriptPath)) {
+      reject(new Error(`DB interface script not found at ${scriptPath}`));
+      return;
+    }
+
+    // Serialize parameters to pass to Python
+    const serializedParams = JSON.stringify(params);
+    
+    // Spawn the Python process
+    const pythonProcess = spawn('python', [
+      scriptPath,
+      operation,
+      serializedParams
+    ]);
+
+    // Collect data from script
+    let scriptOutput = '';
+    let scriptError = '';
+
+    // Collect data from standard output
+    pythonProcess.stdout.on('data', (data) => {
+      scriptOutput += data.toString();
+    });
+
+    // Collect data from standard error
+    pythonProcess.stderr.on('data', (data) => {
+      scriptError += data.toString();
+    });
+
+    // Handle process completion
+    pythonProcess.on('close', (code) => {
+      if (code !== 0) {
+        console.error(`Python script exited with code ${code}`);
+        console.error(`Error: ${scriptError}`);
+        reject(new Error(`Script execution failed: ${scriptError}`));
+        return;
+      }
+
+      try {
+        // Try to parse the output as JSON
+        const result = JSON.parse(scriptOutput);
+        resolve(result);
+      } catch (error) {
+        console.error('Failed to parse script output as JSON:', scriptOutput);
+        reject(new Error('Failed to parse script output as JSON'));
+      }
+    });
+  });
+}
@@ -0,0 +1,95 @@
+import { executeDbQuery } from '@/utils/dbQuery';
+
+// Poll interval while jobs are queued or running
+const POLL_INTERVAL_MS = 2000;
+
+// Longest interval the poller backs off to while no job is active
+const MAX_POLL_INTERVAL_MS = 30000;
+
+export interface ProgressSubscriber {
+  // Jobs this subscriber keeps hearing about until they finish
+  trackedJobs: Set<number>;
+  // Last progress signature sent per job, so only changes are pushed
+  lastSeen: Map<number, string>;
+  send: (event: string, data: any) => void;
+}
+
+// One poller per server process, shared by every open progress stream. Without
+// DB_SERVICE_URL each poll spawns db_interface.py, so the back-off keeps an
+// idle jobs page to a spawn every 30 seconds rather than one per client per tick
+const subscribers = new Set<ProgressSubscriber>();
+let timer: ReturnType<typeof setTimeout> | null = null;
+let polling = false;
+let idleRounds = 0;
+
+function schedule(delay: number) {
+  if (timer) clearTimeout(timer);
+  timer = setTimeout(poll, delay);
+}
+
+async function poll() {
+  timer = null;
+  if (polling || subscribers.size === 0) return;
+  polling = true;
+
+  let active = false;
+  try {
+    const jobIds = new Set<number>();
+    subscribers.forEach(subscriber => subscriber.trackedJobs.forEach(id => jobIds.add(id)));
+
+    const result = await executeDbQuery('get_job_progress', { jobIds: Array.from(jobIds) });
+
+    if (result.success) {
+      for (const subscriber of subscribers) {
+        for (const job of result.jobs) {
+          const signature = `${job.status}|${job.tweet_count}|${job.last_page_at}`;
+          if (subscriber.lastSeen.get(job.job_id) !== signature) {
+            subscriber.lastSeen.set(job.job_id, signature);
+            subscriber.send('progress', job);
+          }
+
+          if (job.status === 'PENDING' || job.status === 'RUNNING') {
+            subscriber.trackedJobs.add(job.job_id);
+          } else {
+            subscriber.trackedJobs.delete(job.job_id);
+          }
+        }
+      }
+      active = result.jobs.some((job: any) => job.status === 'PENDING' || job.status === 'RUNNING');
+    } else {
+      subscribers.forEach(subscriber => subscriber.send('error', { error: result.error }));
+    }
+  } catch (error: any) {
+    subscribers.forEach(subscriber => subscriber.send('error', { error: error.message }));
+  } finally {
+    polling = false;
+  }
+
+  // Back off while nothing is queued or running
+  idleRounds = active ? 0 : idleRounds + 1;
+  if (subscribers.size > 0) {
+    schedule(Math.min(POLL_INTERVAL_MS * 2 ** idleRounds, MAX_POLL_INTERVAL_MS));
+  }
+}
+
+// Add a subscriber and return a function that removes it
+export function subscribeToJobProgress(subscriber: ProgressSubscriber): () => void {
+  subscribers.add(subscriber);
+  wakeJobProgress();
+
+  return () => {
+    subscribers.delete(subscriber);
+    if (subscribers.size === 0 && timer) {
+      clearTimeout(timer);
+      timer = null;
+    }
+  };
+}
+
+// Poll right away at full speed, e.g. after a job was started
+export function wakeJobProgress() {
+  idleRounds = 0;
+  if (subscribers.size > 0) {
+    schedule(0);
+  }
+}
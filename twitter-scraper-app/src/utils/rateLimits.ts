@@ -26,6 +26,12 @@ export const rateLimits: Record<string, RateLimit> = {
     resetMinutes: 15,
     description: 'Get user tweets'
   },
+  'MULTI_USER_TWEETS': {
+    endpoint: 'UserTweets',
+    limit: 50,
+    resetMinutes: 15,
+    description: 'Get tweets from several users'
+  },
   'USER_REPLIES': {
     endpoint: 'UserTweetsAndReplies',
     limit: 50,
@@ -44,6 +50,18 @@ export const rateLimits: Record<string, RateLimit> = {
     resetMinutes: 15,
     description: 'Get user liked tweets'
   },
+  'THREAD_EXPANSION': {
+    endpoint: 'TweetDetail',
+    limit: 150,
+    resetMinutes: 15,
+    description: 'Expand reply threads'
+  },
+  'METRICS_REFRESH': {
+    endpoint: 'TweetResultsByRestIds',
+    limit: 150,
+    resetMinutes: 15,
+    description: 'Refresh engagement metrics by tweet id'
+  },
   'DATE_RANGE_TWEETS': {
     endpoint: 'SearchTimeline',
     limit: 50,
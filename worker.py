@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+import sys
+import os
+import json
+import uuid
+import socket
+import asyncio
+from tweet_scraper_service import TweetScraperService
+from scraper_api import run_job
+
+# Seconds between heartbeats of a running job
+HEARTBEAT_INTERVAL = 15
+
+# A RUNNING job whose heartbeat is older than this is considered abandoned
+STALE_AFTER = 90
+
+# Attempts a job gets before the reaper marks it FAILED
+MAX_ATTEMPTS = 3
+
+# Seconds an idle worker waits before checking the queue again
+IDLE_POLL_INTERVAL = 2
+
+# Seconds between reaper passes run by each worker
+REAP_INTERVAL = 60
+
+def make_worker_id():
+    """Identify this worker process across hosts"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+async def heartbeat(scraper, job_id, worker_id, job_task):
+    """Keep the job's heartbeat fresh, cancelling the job if another worker took it over"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        owned = await loop.run_in_executor(None, scraper.heartbeat_job, job_id, worker_id)
+        if not owned:
+            print(f"Job {job_id} is no longer owned by {worker_id}, stopping it")
+            job_task.cancel()
+            return
+
+async def process_job(scraper, job, worker_id):
+    """Run one claimed job while heartbeating"""
+    job_task = asyncio.ensure_future(
+        run_job(scraper, job['job_id'], job['job_type'], job['query'], job['parameters'], worker_id))
+    heartbeat_task = asyncio.ensure_future(heartbeat(scraper, job['job_id'], worker_id, job_task))
+    try:
+        result = await job_task
+        print(json.dumps(result), flush=True)
+    except asyncio.CancelledError:
+        if heartbeat_task.done():
+            # Lost ownership: the job has been requeued and is someone else's now
+            return
+        # This worker is shutting down, let another one pick the job up
+        scraper.release_job(job['job_id'], worker_id)
+        raise
+    except Exception as e:
+        print(f"Error running job {job['job_id']}: {e}")
+        scraper.update_job_status(job['job_id'], 'FAILED', result={"error": str(e)}, worker_id=worker_id)
+    finally:
+        heartbeat_task.cancel()
+
+async def worker_loop(scraper, worker_id, stop_when_idle):
+    """Claim and run jobs one at a time until the queue is empty or forever"""
+    loop = asyncio.get_running_loop()
+    while True:
+        job = await loop.run_in_executor(None, scraper.claim_job, worker_id)
+        if job is None:
+            if stop_when_idle:
+                return
+            await asyncio.sleep(IDLE_POLL_INTERVAL)
+            continue
+        await process_job(scraper, job, worker_id)
+
+async def reaper_loop(scraper, stale_after, max_attempts):
+    """Periodically requeue jobs whose worker died"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await loop.run_in_executor(None, scraper.reap_stale_jobs, stale_after, max_attempts)
+        await asyncio.sleep(REAP_INTERVAL)
+
+async def run_worker(params):
+    """
+    Pull PENDING jobs from scraping_jobs and run them
+
+    Start one of these on as many hosts as needed; they coordinate only
+    through the database. Slots run jobs concurrently in this process and
+    share one Twitter session and its rate budgets.
+    """
+    slots = int(params.get('concurrency', 1))
+    stale_after = int(params.get('staleAfter', STALE_AFTER))
+    max_attempts = int(params.get('maxAttempts', MAX_ATTEMPTS))
+    stop_when_idle = bool(params.get('once', False))
+    worker_id = params.get('workerId') or make_worker_id()
+
+    scraper = TweetScraperService()
+    if not await scraper.initialize():
+        return {"error": "Failed to initialize Twitter client"}
+
+    print(f"Worker {worker_id} started with {slots} slot(s)")
+    reaper = asyncio.ensure_future(reaper_loop(scraper, stale_after, max_attempts))
+    try:
+        await asyncio.gather(*(worker_loop(scraper, f"{worker_id}/{slot}", stop_when_idle)
+                               for slot in range(slots)))
+    finally:
+        reaper.cancel()
+
+    return {"success": True, "workerId": worker_id}
+
+def reap(params):
+    """Run a single reaper pass"""
+    scraper = TweetScraperService()
+    result = scraper.reap_stale_jobs(int(params.get('staleAfter', STALE_AFTER)),
+                                     int(params.get('maxAttempts', MAX_ATTEMPTS)))
+    return {"success": True, **result}
+
+def main():
+    """Main function to handle worker operations"""
+    if len(sys.argv) < 2:
+        print(json.dumps({"error": "Operation is required"}))
+        return
+
+    operation = sys.argv[1]
+
+    # Parse parameters if provided
+    params = {}
+    if len(sys.argv) > 2:
+        try:
+            params = json.loads(sys.argv[2])
+        except json.JSONDecodeError:
+            print(json.dumps({"error": "Invalid JSON parameters"}))
+            return
+
+    result = {"error": "Unknown operation"}
+
+    if operation == "run":
+        try:
+            result = asyncio.run(run_worker(params))
+        except KeyboardInterrupt:
+            result = {"success": True, "stopped": True}
+    elif operation == "reap":
+        result = reap(params)
+
+    print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()